@@ -0,0 +1,74 @@
+"""Micro-benchmark for MarkdownBuilder on large documents.
+
+Compares the fragment-buffer builder with the previous string-concatenation
+implementation on documents of 10k blocks. Run with:
+
+    poetry run python benchmarks/bench_markdown_builder.py
+"""
+
+from __future__ import annotations
+
+import io
+import timeit
+
+from tap_saneedgedb.markdown_builder import MarkdownBuilder
+
+BLOCKS = 10_000
+REPEAT = 5
+
+
+class ConcatMarkdownBuilder:
+    """The previous implementation, kept here as the baseline."""
+
+    def __init__(self):
+        self.content = ""
+
+    def h3(self, text):
+        self.content += f"### {text}\n\n"
+        return self
+
+    def paragraph(self, text):
+        self.content += f"{text}\n"
+        return self
+
+    def unordered_list(self, item):
+        self.content += f"- {item}\n"
+        return self
+
+    def image(self, url, alt_text=""):
+        self.content += f"![{alt_text}]({url})\n\n"
+        return self
+
+    def build(self):
+        return self.content.strip()
+
+
+def fill(builder):
+    for i in range(BLOCKS):
+        kind = i % 4
+        if kind == 0:
+            builder.h3(f"Heading {i}")
+        elif kind == 1:
+            builder.paragraph("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4)
+        elif kind == 2:
+            builder.unordered_list(f"List item {i}")
+        else:
+            builder.image(f"https://example.com/images/{i}.png")
+    return builder
+
+
+def bench(label, func):
+    best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print(f"{label:<32} {best * 1000:8.2f} ms")
+
+
+def main():
+    assert fill(MarkdownBuilder()).build() == fill(ConcatMarkdownBuilder()).build()
+    print(f"{BLOCKS} blocks, best of {REPEAT}")
+    bench("string concatenation + build", lambda: fill(ConcatMarkdownBuilder()).build())
+    bench("fragment buffer + build", lambda: fill(MarkdownBuilder()).build())
+    bench("fragment buffer + write_to", lambda: fill(MarkdownBuilder()).write_to(io.StringIO()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Offline startup benchmarks for the tap.
+
+Each measurement runs in a fresh interpreter, as the orchestrator launches the
+tap, and reports the median of `--repeat` runs of:
+
+- `import_seconds`: importing `tap_saneedgedb.tap`;
+- `about_seconds`: running `tap-saneedgedb --about` to completion;
+- `time_to_first_record`: starting a tiny incremental sync of `sane_spaces`
+  against `FakeClient` until its first RECORD message, including generating
+  its small synthetic dataset;
+- `run_seconds`: running that sync to completion.
+
+Run with:
+
+    poetry run python -m benchmarks.bench_startup
+
+Results can be saved with `--json results.json` and compared against a saved
+baseline with `--compare baseline.json`, which exits non-zero when a
+measurement regresses by more than `--tolerance`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+_IMPORT = (
+    "import time; started = time.perf_counter(); import tap_saneedgedb.tap; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def run_tiny_sync(rows: int) -> None:
+    """Sync the last `rows` spaces of a small dataset, writing to stdout."""
+    from unittest import mock
+
+    from benchmarks import fake_edgedb, synthetic
+    from tap_saneedgedb.tap import TapSaneEdgedbTap
+
+    dataset = synthetic.generate(users=5, spaces=max(rows, 50), nodes=5, max_blocks=1, seed=1)
+    state = {
+        "bookmarks": {
+            "sane_spaces": {
+                "replication_key": "updated",
+                "replication_key_value": dataset.spaces[-rows].updated.isoformat(),
+            }
+        }
+    }
+    with mock.patch("edgedb.create_client", fake_edgedb.create_client(dataset)):
+        tap = TapSaneEdgedbTap(config={"stream_name": "sane_spaces"}, state=state)
+        tap.sync_all()
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT], check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_about() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "tap_saneedgedb", "--about"],
+        check=True,
+        capture_output=True,
+    )
+    return time.perf_counter() - started
+
+
+def measure_tiny_sync(rows: int) -> Tuple[float, float]:
+    """Return the time to the first RECORD message and to the end of the sync."""
+    started = time.perf_counter()
+    first_record: Optional[float] = None
+    with subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--tiny-sync", str(rows)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ) as process:
+        for line in process.stdout:
+            if first_record is None and line.startswith('{"type":"RECORD"'):
+                first_record = time.perf_counter() - started
+    if process.returncode:
+        msg = f"Tiny sync exited with status {process.returncode}"
+        raise RuntimeError(msg)
+    return first_record or 0.0, time.perf_counter() - started
+
+
+def measure(repeat: int, rows: int) -> Dict[str, float]:
+    samples: Dict[str, List[float]] = {
+        "import_seconds": [],
+        "about_seconds": [],
+        "time_to_first_record": [],
+        "run_seconds": [],
+    }
+    for _ in range(repeat):
+        samples["import_seconds"].append(measure_import())
+        samples["about_seconds"].append(measure_about())
+        first_record, run = measure_tiny_sync(rows)
+        samples["time_to_first_record"].append(first_record)
+        samples["run_seconds"].append(run)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> bool:
+    """Print regressions against `baseline` and return whether there were none."""
+    ok = True
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is not None and current > previous * (1 + tolerance):
+            ok = False
+            print(f"REGRESSION {name}: {previous:.4g} -> {current:.4g}")
+    return ok
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=5, help="Records of the tiny sync.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Baseline results to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--tiny-sync", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.tiny_sync is not None:
+        run_tiny_sync(args.tiny_sync)
+        return 0
+
+    results = measure(args.repeat, args.rows)
+    for name, value in results.items():
+        print(f"{name:<24} {value * 1000:>10.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            return 0 if compare(results, json.load(fp), args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
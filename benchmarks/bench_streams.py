@@ -0,0 +1,176 @@
+"""Offline throughput benchmarks for the tap's streams.
+
+Runs full syncs against `FakeClient` and a synthetic dataset, and reports for
+each scenario the records written per second, the time to the first RECORD
+message and the peak traced memory. Run with:
+
+    poetry run python -m benchmarks.bench_streams
+
+Results can be saved with `--json results.json` and compared against a saved
+baseline with `--compare baseline.json`, which exits non-zero when a scenario
+regresses by more than `--tolerance`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Optional, Union
+from unittest import mock
+
+from benchmarks import fake_edgedb, synthetic
+from tap_saneedgedb.tap import TapSaneEdgedbTap
+
+STREAMS = ("sane_users", "sane_spaces", "sane_space_nodes")
+
+
+class RecordSink:
+    """Stand-in for stdout that counts RECORD messages.
+
+    Also stands in for `stdout.buffer`, which the fast output mode writes to.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_record: Optional[float] = None
+        self.records = 0
+
+    @property
+    def buffer(self) -> RecordSink:
+        return self
+
+    def write(self, data: Union[str, bytes]) -> int:
+        # Buffered writers may write many messages at once.
+        marker = b'{"type":"RECORD"' if isinstance(data, bytes) else '{"type":"RECORD"'
+        records = data.count(marker)
+        if records:
+            if self.first_record is None:
+                self.first_record = time.perf_counter() - self.started
+            self.records += records
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def run_sync(dataset: synthetic.Dataset, config: Dict[str, Any], latency: float) -> RecordSink:
+    """Run a full sync of the tap against `dataset`, discarding the output."""
+    with mock.patch(
+        "edgedb.create_client",
+        fake_edgedb.create_client(dataset, latency=latency),
+    ):
+        tap = TapSaneEdgedbTap(config=config, validate_config=False)
+        sink = RecordSink()
+        with contextlib.redirect_stdout(sink):
+            tap.sync_all()
+    return sink
+
+
+def measure(dataset: synthetic.Dataset, config: Dict[str, Any], latency: float) -> Dict[str, float]:
+    started = time.perf_counter()
+    sink = run_sync(dataset, config, latency)
+    elapsed = time.perf_counter() - started
+
+    # Traced separately, since tracing slows the sync down.
+    tracemalloc.start()
+    try:
+        run_sync(dataset, config, latency)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "records": sink.records,
+        "seconds": elapsed,
+        "records_per_second": sink.records / elapsed if elapsed else 0.0,
+        "time_to_first_record": sink.first_record or 0.0,
+        "peak_memory_mb": peak / 1024 / 1024,
+    }
+
+
+def scenarios() -> Dict[str, Dict[str, Any]]:
+    result: Dict[str, Dict[str, Any]] = {
+        stream: {"stream_name": stream} for stream in STREAMS
+    }
+    result["all_streams"] = {}
+    result["all_streams_concurrent"] = {"concurrent_streams": True}
+    result["all_streams_auto_tune"] = {"auto_tune": True, "space_nodes_partition_days": 90}
+    result["all_streams_fast_output"] = {
+        "fast_output": True,
+        "skip_nested_conformance": True,
+    }
+    result["all_streams_json_passthrough"] = {
+        "json_passthrough": True,
+        "fast_output": True,
+        "skip_nested_conformance": True,
+    }
+    result["sane_space_nodes_partitioned"] = {
+        "stream_name": "sane_space_nodes",
+        "space_nodes_partition_days": 90,
+        "partition_workers": 4,
+    }
+    return result
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """Print regressions against `baseline` and return whether there were none."""
+    ok = True
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        checks = (
+            ("records_per_second", current["records_per_second"] < previous["records_per_second"] * (1 - tolerance)),
+            ("time_to_first_record", current["time_to_first_record"] > previous["time_to_first_record"] * (1 + tolerance)),
+            ("peak_memory_mb", current["peak_memory_mb"] > previous["peak_memory_mb"] * (1 + tolerance)),
+        )
+        for metric, regressed in checks:
+            if regressed:
+                ok = False
+                print(f"REGRESSION {name}.{metric}: {previous[metric]:.4g} -> {current[metric]:.4g}")
+    return ok
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--spaces", type=int, default=1000)
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per query.")
+    parser.add_argument("--only", action="append", help="Run only these scenarios.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Baseline results to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    dataset = synthetic.generate(args.users, args.spaces, args.nodes)
+    results: Dict[str, dict] = {}
+    print(f"{'scenario':<32} {'records':>8} {'rec/s':>10} {'first (ms)':>11} {'peak (MB)':>10}")
+    for name, config in scenarios().items():
+        if args.only and name not in args.only:
+            continue
+        config = {"page_size": args.page_size, **config}
+        result = results[name] = measure(dataset, config, args.latency)
+        print(
+            f"{name:<32} {result['records']:>8} {result['records_per_second']:>10.0f} "
+            f"{result['time_to_first_record'] * 1000:>11.1f} {result['peak_memory_mb']:>10.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            return 0 if compare(results, json.load(fp), args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
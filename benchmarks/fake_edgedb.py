@@ -0,0 +1,179 @@
+"""In-memory stand-in for the EdgeDB client used by the tap.
+
+`FakeClient` does not parse EdgeQL. It recognises which of the tap's queries
+it is given by the type they select from, and whether they select deleted
+objects by `deleted_at`, and applies the same keyset pagination and filtering
+to a synthetic `Dataset`.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import time
+from bisect import bisect_right
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple, Union
+from uuid import UUID
+
+import edgedb
+
+from benchmarks.synthetic import Dataset
+
+_SELECTED_TYPE = re.compile(r"select\s+(User|Space|Node)\b", re.IGNORECASE)
+_COUNT = re.compile(r"^select count\(\((.*)\)\)$", re.DOTALL)
+# Final shape of a query, and the names of its elements.
+_SHAPE = re.compile(r"select\s+(?:users|spaces|nodes)\s*\{(.*)\}\s*order by", re.DOTALL | re.IGNORECASE)
+_SHAPE_NAME = re.compile(r"^\s*(\w+)(?:\s*:=|,?$)", re.MULTILINE)
+
+# Replication key of the rows of each type.
+_KEYS = {"User": "created", "Space": "updated", "Node": "updated"}
+
+_EMPTY_BLOCK = json.dumps({})
+
+# Attributes of the rows holding the properties that `query_json` names after
+# the record property, where they differ.
+_JSON_ATTRIBUTES = {
+    "User": {
+        "id": "user_id",
+        "spaces": "space_list",
+        "following": "following_list",
+        "_sdc_deleted_at": "deleted_at",
+    },
+    "Space": {
+        "deletion": "deleted",
+        "owner": "owner_id",
+        "nodes": "nodes_list",
+        "followers": "followers_list",
+        "_sdc_deleted_at": "deleted_at",
+    },
+    "Node": {"deletion": "deleted", "_sdc_deleted_at": "deleted_at"},
+}
+
+
+class FakeClient:
+    """Serve the tap's queries from a synthetic dataset.
+
+    Args:
+        dataset: The rows to serve.
+        latency: Seconds to sleep per query, to model the network round trip.
+        timeout_above: Page size above which queries time out, if any.
+    """
+
+    def __init__(
+        self, dataset: Dataset, latency: float = 0.0, timeout_above: Optional[int] = None
+    ) -> None:
+        self.dataset = dataset
+        self.latency = latency
+        self.timeout_above = timeout_above
+        self.queries: List[Tuple[str, Dict[str, Any]]] = []
+        self._rows: Dict[Tuple[str, bool], List[SimpleNamespace]] = {}
+        self._index: Dict[Tuple[str, bool], List[Tuple[datetime, UUID]]] = {}
+        for type_name, key in _KEYS.items():
+            live = [row for row in dataset.rows(type_name) if row.deleted_at is None]
+            deleted = sorted(
+                (row for row in dataset.rows(type_name) if row.deleted_at is not None),
+                key=lambda row: (row.deleted_at, row.id),
+            )
+            for is_deletion, rows, row_key in (
+                (False, live, key),
+                (True, deleted, "deleted_at"),
+            ):
+                self._rows[type_name, is_deletion] = rows
+                self._index[type_name, is_deletion] = [
+                    (getattr(row, row_key), row.id) for row in rows
+                ]
+
+    def query(self, query: str, **kwargs: Any) -> List[SimpleNamespace]:
+        self.queries.append((query, kwargs))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.timeout_above is not None and kwargs["limit"] > self.timeout_above:
+            raise edgedb.QueryTimeoutError("canceling statement due to statement timeout")
+        match = _SELECTED_TYPE.search(query)
+        if match is None:
+            msg = f"FakeClient does not know how to run: {query}"
+            raise NotImplementedError(msg)
+        type_name = match.group(1)
+        is_deletion = "deleted_at" in query
+        rows = self._rows[type_name, is_deletion]
+        index = self._index[type_name, is_deletion]
+
+        start = bisect_right(index, (kwargs["last_updated"], kwargs["last_id"]))
+        updated_before: Optional[datetime] = kwargs.get("updated_before")
+        page = []
+        for position in range(start, len(rows)):
+            if len(page) == kwargs["limit"]:
+                break
+            if updated_before is not None and index[position][0] >= updated_before:
+                break
+            page.append(rows[position])
+
+        if type_name == "Node":
+            page = [_filter_blocks(row) for row in page]
+        return page
+
+    def query_json(self, query: str, **kwargs: Any) -> str:
+        """Run `query` and encode the elements of its final shape as JSON."""
+        rows = self.query(query, **kwargs)
+        type_name = _SELECTED_TYPE.search(query).group(1)
+        names = _SHAPE_NAME.findall(_SHAPE.search(query).group(1))
+        attributes = _JSON_ATTRIBUTES[type_name]
+        return json.dumps(
+            [
+                {name: getattr(row, attributes.get(name, name)) for name in names}
+                for row in rows
+            ],
+            default=_encode,
+        )
+
+    def query_single(self, query: str, **kwargs: Any) -> Any:
+        match = _COUNT.match(query)
+        if match is None:
+            msg = f"FakeClient does not know how to run: {query}"
+            raise NotImplementedError(msg)
+        return len(self.query(match.group(1), **kwargs))
+
+    def close(self) -> None:
+        pass
+
+
+def _filter_blocks(row: SimpleNamespace) -> SimpleNamespace:
+    """Apply the node query's `child_blocks` filter."""
+    if row.node_type == "Text":
+        child_blocks = [b for b in row.child_blocks if b.block_data != _EMPTY_BLOCK]
+    else:
+        child_blocks = []
+    return SimpleNamespace(**{**vars(row), "child_blocks": child_blocks})
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, SimpleNamespace):
+        # A child block, whose `json` data EdgeDB embeds as is.
+        return {"block_type": value.block_type, "block_data": json.loads(value.block_data)}
+    msg = f"Cannot encode {value!r}"
+    raise TypeError(msg)
+
+
+def create_client(
+    dataset: Union[Dataset, Dict[str, Dataset]],
+    latency: float = 0.0,
+    timeout_above: Optional[int] = None,
+):
+    """Return a replacement for `edgedb.create_client` serving `dataset`.
+
+    `dataset` may also map database or branch names onto the dataset of each.
+    """
+
+    def _create_client(**kwargs: Any) -> FakeClient:
+        if not isinstance(dataset, Dataset):
+            name = kwargs.get("branch") or kwargs.get("database")
+            return FakeClient(dataset[name], latency=latency, timeout_above=timeout_above)
+        return FakeClient(dataset, latency=latency, timeout_above=timeout_above)
+
+    return _create_client
@@ -0,0 +1,225 @@
+"""Synthetic `User`, `Space` and `Node` datasets for offline benchmarks.
+
+Rows are generated in the shape the tap's queries select, with `json` values
+encoded as strings as the EdgeDB client returns them. Text nodes carry
+`child_blocks` in every shape `rich_text_serializer` handles.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+NODE_TYPES = ("Text", "Text", "Link", "PDF")
+
+LOREM = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+
+@dataclass
+class Dataset:
+    users: List[SimpleNamespace] = field(default_factory=list)
+    spaces: List[SimpleNamespace] = field(default_factory=list)
+    nodes: List[SimpleNamespace] = field(default_factory=list)
+
+    def rows(self, type_name: str) -> List[SimpleNamespace]:
+        return {"User": self.users, "Space": self.spaces, "Node": self.nodes}[type_name]
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(LOREM) for _ in range(count))
+
+
+def _inline_items(rng: random.Random) -> List[Dict[str, Any]]:
+    """Items of a list-valued `block_data`, one of each inline shape."""
+    items: List[Dict[str, Any]] = []
+    for _ in range(rng.randint(1, 6)):
+        kind = rng.randrange(8)
+        if kind == 0:
+            items.append({"type": "text", "isHeading": True, "content": _words(rng, 4)})
+        elif kind == 1:
+            items.append({"type": "text", "isBulletListItem": True, "text": _words(rng, 8)})
+        elif kind == 2:
+            items.append({"type": "text", "isNumberedListItem": True, "text": _words(rng, 8)})
+        elif kind == 3:
+            items.append({"type": "text", "text": _words(rng, 20) + " "})
+        elif kind == 4:
+            items.append({
+                "type": "pdf",
+                "pdfFileKey": f"{uuid.UUID(int=rng.getrandbits(128))}.pdf",
+                "originalFilename": f"{_words(rng, 2)}.pdf",
+            })
+        elif kind == 5:
+            items.append({"imageSrc": f"https://images.example.com/{rng.getrandbits(32)}.png"})
+        elif kind == 6:
+            items.append({
+                "type": "link",
+                "href": f"https://example.com/{rng.getrandbits(32)}",
+                "content": [{"text": _words(rng, 3)}],
+            })
+        else:
+            items.append({"type": "link", "href": f"https://example.com/{rng.getrandbits(32)}", "content": []})
+    return items
+
+
+def _block_data(rng: random.Random) -> Any:
+    """A `block_data` value in one of the shapes the serializer handles."""
+    kind = rng.randrange(11)
+    if kind == 0:
+        return _inline_items(rng)
+    if kind == 1:
+        return {"isBulletListItem": True, "content": _words(rng, 8)}
+    if kind == 2:
+        return {"isNumberedListItem": True, "content": _words(rng, 8)}
+    if kind == 3:
+        return {"isHeading": True, "content": _words(rng, 4)}
+    if kind == 4:
+        return {"imageSrc": {"filename": f"https://images.example.com/{rng.getrandbits(32)}.jpg"}}
+    if kind == 5:
+        return {"youtubeSrc": f"https://youtube.com/watch?v={rng.getrandbits(32)}"}
+    if kind == 6:
+        return {
+            "type": "weblink",
+            "title": _words(rng, 3),
+            "url": f"https://example.com/{rng.getrandbits(32)}",
+            "description": _words(rng, 12),
+        }
+    if kind == 7:
+        return {"pdfFileKey": f"{rng.getrandbits(64)}.pdf", "originalFilename": f"{_words(rng, 2)}.pdf"}
+    if kind == 8:
+        # Filtered out by the node query.
+        return {}
+    return {"text": _words(rng, rng.randint(10, 80))}
+
+
+def _child_blocks(rng: random.Random, max_blocks: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(block_type="rich_text", block_data=json.dumps(_block_data(rng)))
+        for _ in range(rng.randint(1, max_blocks))
+    ]
+
+
+def generate(
+    users: int = 100,
+    spaces: int = 200,
+    nodes: int = 2000,
+    *,
+    max_blocks: int = 60,
+    max_followers: int = 500,
+    span: timedelta = timedelta(days=730),
+    deleted: float = 0.0,
+    seed: int = 0,
+) -> Dataset:
+    """Generate a deterministic synthetic dataset.
+
+    Args:
+        users: Number of users.
+        spaces: Number of spaces.
+        nodes: Number of nodes.
+        max_blocks: Maximum number of `child_blocks` per Text node.
+        max_followers: Maximum number of followers per space.
+        span: Time range over which rows are created and updated.
+        deleted: Fraction of the rows that are deleted. Deleted rows have a
+            `deleted_at` time, which for nodes is also set by the deletion of
+            their space, and is `None` otherwise.
+        seed: Seed of the random generator.
+
+    Returns:
+        The dataset, with each list sorted like the tap's queries.
+    """
+    rng = random.Random(seed)
+    seconds = int(span.total_seconds())
+
+    def timestamp() -> datetime:
+        # Truncated to whole minutes, so that many rows share a timestamp and
+        # keyset pagination has to break ties on id.
+        return START + timedelta(minutes=rng.randrange(seconds // 60))
+
+    user_ids = [_uuid(rng) for _ in range(users)]
+    space_ids = [_uuid(rng) for _ in range(spaces)]
+    node_ids = [_uuid(rng) for _ in range(nodes)]
+    owners = {space_id: rng.choice(user_ids) for space_id in space_ids}
+    owning_space = {node_id: rng.choice(space_ids) for node_id in node_ids}
+
+    dataset = Dataset()
+    for user_id in user_ids:
+        dataset.users.append(SimpleNamespace(
+            id=user_id,
+            user_id=user_id,
+            username=f"user_{user_id.hex[:8]}",
+            bio=_words(rng, rng.randint(0, 30)),
+            created=timestamp(),
+            deletion=False,
+            space_list=[s for s in space_ids if owners[s] == user_id],
+            following_list=rng.sample(user_ids, rng.randint(0, min(50, users))),
+        ))
+    for space_id in space_ids:
+        created = timestamp()
+        dataset.spaces.append(SimpleNamespace(
+            id=space_id,
+            space_id=space_id,
+            title=_words(rng, 4),
+            description=_words(rng, 25),
+            created=created,
+            updated=created + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+            deleted=False,
+            is_public=rng.random() < 0.8,
+            owner_id=owners[space_id],
+            nodes_list=[n for n in node_ids if owning_space[n] == space_id],
+            followers_list=rng.sample(user_ids, rng.randint(0, min(max_followers, users))),
+            categories=rng.sample(LOREM, 2),
+        ))
+    for node_id in node_ids:
+        created = timestamp()
+        node_type = rng.choice(NODE_TYPES)
+        space_id = owning_space[node_id]
+        dataset.nodes.append(SimpleNamespace(
+            id=node_id,
+            node_id=node_id,
+            space_id=space_id,
+            user_id=owners[space_id],
+            title=_words(rng, 6),
+            created=created,
+            updated=created + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+            deleted=False,
+            node_content=_words(rng, 40) if node_type != "Text" else "",
+            node_type=node_type,
+            node_url=f"https://example.com/{node_id}" if node_type == "Link" else "",
+            child_blocks=_child_blocks(rng, max_blocks) if node_type == "Text" else [],
+            categories=rng.sample(LOREM, 2),
+        ))
+
+    # Drawn last, so that the rest of the dataset does not depend on it.
+    for rows, flag in (
+        (dataset.users, "deletion"),
+        (dataset.spaces, "deleted"),
+        (dataset.nodes, "deleted"),
+    ):
+        for row in rows:
+            row.deleted_at = None
+            if rng.random() < deleted:
+                setattr(row, flag, True)
+                row.deleted_at = max(row.created, timestamp())
+    deleted_spaces = {row.id: row.deleted_at for row in dataset.spaces}
+    for row in dataset.nodes:
+        space_deleted_at = deleted_spaces[row.space_id]
+        if space_deleted_at is not None:
+            row.deleted_at = min(filter(None, (row.deleted_at, space_deleted_at)))
+
+    dataset.users.sort(key=lambda row: (row.created, row.id))
+    dataset.spaces.sort(key=lambda row: (row.updated, row.id))
+    dataset.nodes.sort(key=lambda row: (row.updated, row.id))
+    return dataset
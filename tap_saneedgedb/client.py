@@ -2,10 +2,61 @@
 
 from __future__ import annotations
 
-from typing import Iterable
+from typing import TYPE_CHECKING, Any, Iterable, Mapping
 
+from singer_sdk.exceptions import ConfigValidationError
 from singer_sdk.streams import Stream
 
+if TYPE_CHECKING:
+    import edgedb
+
+# Defaults mirror those of `edgedb.create_client`.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_WAIT_UNTIL_AVAILABLE = 30
+
+
+def create_edgedb_client(config: Mapping[str, Any]) -> edgedb.Client:
+    """Create a pooled EdgeDB client from the tap config.
+
+    The client does not connect until the first query is run, so creating it is
+    cheap. Callers are expected to share a single client per tap run, or per
+    target when extracting several databases or branches.
+
+    Args:
+        config: The tap config.
+
+    Returns:
+        A new EdgeDB client.
+
+    Raises:
+        ConfigValidationError: If both a database and a branch are set.
+    """
+    # Imported on first use, so that `--about` and `--discover` never load the
+    # EdgeDB client.
+    import edgedb
+
+    database = config.get("edgedb_database")
+    branch = config.get("edgedb_branch")
+    if database and branch:
+        msg = "Set either `edgedb_database` or `edgedb_branch`, not both."
+        raise ConfigValidationError(msg)
+    # Only passed when set, as the client rejects a database and a branch.
+    selected = {"branch": branch} if branch else {"database": database}
+    return edgedb.create_client(
+        host=config.get("edgedb_host"),
+        port=config.get("edgedb_port"),
+        user=config.get("edgedb_user"),
+        password=config.get("edgedb_password"),
+        secret_key=config.get("edgedb_secret_key"),
+        tls_security=config.get("edgedb_client_tls_security"),
+        max_concurrency=config.get("edgedb_max_concurrency"),
+        timeout=config.get("edgedb_connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        wait_until_available=config.get(
+            "edgedb_wait_until_available", DEFAULT_WAIT_UNTIL_AVAILABLE
+        ),
+        **selected,
+    )
+
 
 class SaneEdgedbTapStream(Stream):
     """Stream class for SaneEdgedbTap streams."""
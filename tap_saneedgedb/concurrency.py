@@ -0,0 +1,174 @@
+"""Helpers for running EdgeDB queries in worker threads."""
+
+from __future__ import annotations
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Mapping, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_QUEUE_SIZE = 8
+
+# How often a blocked producer checks whether the consumer has gone away.
+_PUT_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    """Wraps an exception raised by a producer so it can cross the queue."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_DONE = object()
+
+
+def interleave(
+    sources: Mapping[str, Iterable[T]],
+    *,
+    max_workers: int | None = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> Iterator[Tuple[str, T]]:
+    """Iterate several sources at once in worker threads.
+
+    Each source is consumed by its own worker thread and its items are passed
+    back through one bounded queue, so at most `queue_size` items are buffered
+    no matter how far ahead the producers get. Items of a single source keep
+    their order. An exception raised by a source is re-raised in the consuming
+    thread, and closing the returned iterator stops all producers.
+
+    Args:
+        sources: Iterables keyed by name.
+        max_workers: Maximum number of sources consumed at the same time.
+            Defaults to one worker per source.
+        queue_size: Maximum number of buffered items.
+
+    Yields:
+        `(name, item)` tuples in the order the items were produced.
+    """
+    if not sources:
+        return
+
+    items: queue.Queue = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(entry: tuple) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=_PUT_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce(name: str, source: Iterable[T]) -> None:
+        if stopped.is_set():
+            return
+        try:
+            for item in source:
+                if not put((name, item)):
+                    return
+        except BaseException as ex:  # noqa: BLE001
+            put((name, _Failure(ex)))
+            return
+        put((name, _DONE))
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers or len(sources),
+        thread_name_prefix="tap-saneedgedb",
+    )
+    try:
+        for name, source in sources.items():
+            executor.submit(produce, name, source)
+
+        remaining = len(sources)
+        while remaining:
+            name, item = items.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.error
+            else:
+                yield name, item
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True)
+
+
+def prefetch(
+    sources: Sequence[Iterable[T]],
+    *,
+    max_workers: int,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> List[Iterator[T]]:
+    """Consume sources in worker threads ahead of the caller.
+
+    Sources are started in order, at most `max_workers` at a time, and each one
+    buffers up to `queue_size` items in its own queue. The caller is expected to
+    consume the returned iterators in order; since the source being consumed is
+    always already running, this never deadlocks. Closing any iterator before
+    it is exhausted stops all remaining producers.
+
+    Args:
+        sources: The iterables to consume.
+        max_workers: Maximum number of sources consumed at the same time.
+        queue_size: Maximum number of buffered items per source.
+
+    Returns:
+        One iterator per source, in the same order.
+    """
+    queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in sources]
+    pending: queue.SimpleQueue = queue.SimpleQueue()
+    for index in range(len(sources)):
+        pending.put(index)
+    stopped = threading.Event()
+
+    def put(items: queue.Queue, entry: object) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=_PUT_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def work() -> None:
+        while not stopped.is_set():
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            items = queues[index]
+            try:
+                for item in sources[index]:
+                    if not put(items, item):
+                        return
+            except BaseException as ex:  # noqa: BLE001
+                put(items, _Failure(ex))
+                continue
+            put(items, _DONE)
+
+    def consume(items: queue.Queue) -> Iterator[T]:
+        finished = False
+        try:
+            while True:
+                item = items.get()
+                if item is _DONE:
+                    finished = True
+                    return
+                if isinstance(item, _Failure):
+                    finished = True
+                    raise item.error
+                yield item
+        finally:
+            if not finished:
+                stopped.set()
+
+    # Daemon threads, so that producers abandoned by a failed sync never keep
+    # the process alive.
+    for _ in range(min(max_workers, len(sources))):
+        threading.Thread(target=work, name="tap-saneedgedb-prefetch", daemon=True).start()
+
+    return [consume(items) for items in queues]
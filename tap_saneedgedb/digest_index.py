@@ -0,0 +1,120 @@
+"""On-disk index of the digests of the records written by previous runs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List
+
+# Stream state key holding the generation of the digests covered by the STATE
+# message it was written in.
+GENERATION_KEY = "digest_index_generation"
+
+_SCHEMA = """
+create table if not exists digests (
+    stream text not null,
+    key text not null,
+    digest blob not null,
+    generation integer not null,
+    primary key (stream, key)
+) without rowid
+"""
+
+
+class DigestIndex:
+    """Digest of the last record written for each primary key of each stream.
+
+    Records whose digest is unchanged since they were last written are dropped
+    instead. New digests stay pending until a STATE message covering their
+    records is written, which carries their generation, and are only then
+    committed with `commit`. Pending digests are discarded on `close`, so a
+    failed run never persists the digest of a record no STATE covers.
+
+    The target may still not have saved the STATE messages written last, so
+    only digests up to `trusted_generation`, that of the state the run starts
+    from, are relied upon. The index may be shared by several threads.
+    """
+
+    def __init__(self, directory: str, trusted_generation: int = 0) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "digest_index.sqlite")
+        self.trusted_generation = trusted_generation
+        self.suppressed: Dict[str, int] = {}
+        self.written = 0
+        self.pending = 0
+        self._lock = threading.Lock()
+        # Imported on first use, so that runs without a digest index directory never
+        # load SQLite.
+        import sqlite3
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        (previous,) = self._connection.execute(
+            "select coalesce(max(generation), 0) from digests"
+        ).fetchone()
+        # A STATE message may carry a generation whose digests were never
+        # committed, which must not be reused.
+        self.generation = max(previous, trusted_generation) + 1
+
+    @staticmethod
+    def digest(records: List[dict]) -> bytes:
+        """Return the digest of the records written for a single source record."""
+        payload = json.dumps(records, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+    def unchanged(self, stream: str, key: str, digest: bytes) -> bool:
+        """Return whether `digest` was already written for `key`, else store it.
+
+        Args:
+            stream: Name of the stream the records are written to.
+            key: Primary key of the source record.
+            digest: Digest of the records, from `digest`.
+
+        Returns:
+            Whether the records can be dropped.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "select digest, generation from digests where stream = ? and key = ?",
+                (stream, key),
+            ).fetchone()
+            if row is not None and row[0] == digest and row[1] <= self.trusted_generation:
+                self.suppressed[stream] = self.suppressed.get(stream, 0) + 1
+                return True
+            self._connection.execute(
+                "insert or replace into digests values (?, ?, ?, ?)",
+                (stream, key, digest, self.generation),
+            )
+            self.pending += 1
+            return False
+
+    def commit(self) -> None:
+        """Persist the pending digests, once a STATE message covers them.
+
+        Digests stored from then on get the next generation.
+        """
+        with self._lock:
+            self._connection.commit()
+            self.written += self.pending
+            self.pending = 0
+            self.generation += 1
+
+    def close(self, logger: logging.Logger) -> None:
+        """Discard the pending digests and log the records suppressed from each stream."""
+        with self._lock:
+            self._connection.rollback()
+            self._connection.close()
+        for stream, suppressed in sorted(self.suppressed.items()):
+            logger.info(
+                "Digest index: %d unchanged records of '%s' suppressed.", suppressed, stream
+            )
+        logger.info(
+            "Digest index: %d records suppressed, %d written, %d discarded.",
+            sum(self.suppressed.values()),
+            self.written,
+            self.pending,
+        )
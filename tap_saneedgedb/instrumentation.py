@@ -0,0 +1,272 @@
+"""Extraction metrics and per-phase timings for the tap's streams."""
+
+from __future__ import annotations
+
+import enum
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from singer_sdk import metrics
+
+if sys.platform != "win32":
+    import resource
+else:  # pragma: no cover
+    resource = None
+
+# Upper bounds, in seconds, of the buckets timings are counted in.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+
+class Metric(str, enum.Enum):
+    """Metrics emitted by the tap on top of those of the SDK."""
+
+    QUERY_DURATION = "edgedb_query_duration"
+    DECODE_DURATION = "edgedb_decode_duration"
+    MARKDOWN_DURATION = "markdown_conversion_duration"
+    SERIALIZATION_DURATION = "serialization_duration"
+    ROWS_PER_SECOND = "rows_per_second"
+    DECODED_BYTES = "decoded_bytes"
+    SUPPRESSED_RECORDS = "suppressed_records"
+    PEAK_RSS = "peak_rss_bytes"
+
+
+class Histogram:
+    """Distribution of timings counted in fixed buckets."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": {
+                str(bound): count for bound, count in zip(self.buckets, self.counts)
+            },
+            "overflow": self.counts[-1],
+        }
+
+
+class StreamMetrics:
+    """Thread-safe counters and timings collected while syncing one stream."""
+
+    def __init__(self, stream_name: str) -> None:
+        self.stream_name = stream_name
+        self.rows = 0
+        self.queries = 0
+        self.decoded_bytes = 0
+        self.suppressed_records = 0
+        self.timings: Dict[Metric, Histogram] = {
+            metric: Histogram()
+            for metric in (
+                Metric.QUERY_DURATION,
+                Metric.DECODE_DURATION,
+                Metric.MARKDOWN_DURATION,
+                Metric.SERIALIZATION_DURATION,
+            )
+        }
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, metric: Metric, seconds: float) -> None:
+        with self._lock:
+            self.timings[metric].observe(seconds)
+
+    def add_query(self, seconds: float, rows: int) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            if self._started is None:
+                self._started = now - seconds
+            self._finished = now
+            self.queries += 1
+            self.rows += rows
+            self.timings[Metric.QUERY_DURATION].observe(seconds)
+
+    def add_decoded(
+        self, seconds: float, records: Iterable[dict], size: Optional[int] = None
+    ) -> int:
+        """Record the decoding of `records`, and return their decoded size.
+
+        `size` is the length of the payload the records were decoded from, if
+        known, and is measured with `decoded_size` otherwise.
+        """
+        if size is None:
+            size = decoded_size(records)
+        with self._lock:
+            self.decoded_bytes += size
+            self.timings[Metric.DECODE_DURATION].observe(seconds)
+        return size
+
+    def add_suppressed(self) -> None:
+        """Count a record dropped by the digest index."""
+        with self._lock:
+            self.suppressed_records += 1
+
+    @property
+    def rows_per_second(self) -> float:
+        if self._started is None or self._finished is None:
+            return 0.0
+        elapsed = self._finished - self._started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "queries": self.queries,
+                "rows_per_second": self.rows_per_second,
+                "decoded_bytes": self.decoded_bytes,
+                "suppressed_records": self.suppressed_records,
+                "timings": {
+                    metric.value: histogram.to_dict()
+                    for metric, histogram in self.timings.items()
+                },
+            }
+
+    def log(self, logger: logging.Logger) -> None:
+        """Log the collected metrics as Singer SDK METRIC lines."""
+        tags = {metrics.Tag.STREAM: self.stream_name}
+        summary = self.to_dict()
+        for metric, histogram in summary["timings"].items():
+            if histogram["count"]:
+                metrics.log(
+                    logger,
+                    metrics.Point("histogram", Metric(metric), histogram, tags),
+                )
+        metrics.log(
+            logger,
+            metrics.Point(
+                "gauge", Metric.ROWS_PER_SECOND, summary["rows_per_second"], tags
+            ),
+        )
+        metrics.log(
+            logger,
+            metrics.Point("counter", Metric.DECODED_BYTES, summary["decoded_bytes"], tags),
+        )
+        if summary["suppressed_records"]:
+            metrics.log(
+                logger,
+                metrics.Point(
+                    "counter", Metric.SUPPRESSED_RECORDS, summary["suppressed_records"], tags
+                ),
+            )
+
+
+def decoded_size(records: Iterable[dict]) -> int:
+    """Return the length of `records` encoded as JSON, nested values included.
+
+    UUIDs and datetimes count as their string form, which is close to their
+    length in the payload of `query_json`.
+    """
+    return len(json.dumps(list(records), separators=(",", ":"), default=str))
+
+
+def peak_rss() -> Optional[int]:
+    """Return the peak resident set size of the process in bytes, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def log_peak_rss(logger: logging.Logger) -> None:
+    rss = peak_rss()
+    if rss is not None:
+        metrics.log(logger, metrics.Point("gauge", Metric.PEAK_RSS, rss))
+
+
+def write_summary(
+    path: str,
+    stream_metrics: Mapping[str, StreamMetrics],
+    output_format: str = "json",
+) -> None:
+    """Write the metrics of every stream as a JSON or Prometheus textfile summary.
+
+    Args:
+        path: Path of the summary file.
+        stream_metrics: Metrics keyed by stream name.
+        output_format: Either `json` or `prometheus`.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    summaries = {name: m.to_dict() for name, m in stream_metrics.items()}
+    if output_format == "json":
+        content = json.dumps(
+            {"streams": summaries, Metric.PEAK_RSS.value: peak_rss()}, indent=2
+        )
+    elif output_format == "prometheus":
+        content = _to_prometheus(summaries)
+    else:
+        msg = f"Unsupported metrics summary format: {output_format}"
+        raise ValueError(msg)
+
+    # Write then rename, so a textfile collector never reads a partial file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        fp.write(content)
+    os.replace(tmp_path, path)
+
+
+def _to_prometheus(summaries: Mapping[str, dict]) -> str:
+    prefix = "tap_saneedgedb"
+    lines: List[str] = []
+
+    def sample(name: str, value: float, **labels: str) -> None:
+        label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+    for kind, name, key in (
+        ("counter", "rows_total", "rows"),
+        ("counter", "queries_total", "queries"),
+        ("gauge", "rows_per_second", "rows_per_second"),
+        ("counter", "decoded_bytes_total", "decoded_bytes"),
+        ("counter", "suppressed_records_total", "suppressed_records"),
+    ):
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for stream, summary in summaries.items():
+            sample(name, summary[key], stream=stream)
+
+    for metric in Metric:
+        histograms = {
+            stream: summary["timings"][metric.value]
+            for stream, summary in summaries.items()
+            if metric.value in summary["timings"]
+        }
+        if not histograms:
+            continue
+        name = f"{metric.value}_seconds"
+        lines.append(f"# TYPE {prefix}_{name} histogram")
+        for stream, histogram in histograms.items():
+            cumulative = 0
+            for bound, count in histogram["buckets"].items():
+                cumulative += count
+                sample(f"{name}_bucket", cumulative, stream=stream, le=bound)
+            sample(f"{name}_bucket", histogram["count"], stream=stream, le="+Inf")
+            sample(f"{name}_sum", histogram["sum"], stream=stream)
+            sample(f"{name}_count", histogram["count"], stream=stream)
+
+    rss = peak_rss()
+    if rss is not None:
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {rss}")
+    return "\n".join(lines) + "\n"
@@ -1,42 +1,103 @@
+from typing import List, TextIO
+
+
+# Markdown fragments, shared by `MarkdownBuilder` and the streaming serializer.
+
+def h3(text: str) -> str:
+    return f"### {text}\n\n"
+
+
+def paragraph(text: str) -> str:
+    return f"{text}\n"
+
+
+def inline_link(text: str, url: str) -> str:
+    return f"[{text}]({url})"
+
+
+def link(text: str, url: str, description: str = "") -> str:
+    return f"[{text}]({url}){f' {description}' if description else ''}\n"
+
+
+def image(url: str, alt_text: str = "") -> str:
+    return f"![{alt_text}]({url})\n\n"
+
+
+def ordered_list(item: str) -> str:
+    return f"1. {item}\n"
+
+
+def unordered_list(item: str) -> str:
+    return f"- {item}\n"
+
+
 class MarkdownBuilder:
     def __init__(self):
-        self.content = ""
+        # Fragments are only joined once, in `build` or `write_to`, so adding
+        # content stays linear in the size of the document.
+        self.parts: List[str] = []
 
     def h3(self, text: str) -> 'MarkdownBuilder':
-        self.content += f"### {text}\n\n"
+        self.parts.append(h3(text))
         return self
 
     def paragraph(self, text: str) -> 'MarkdownBuilder':
-        self.content += f"{text}\n"
+        self.parts.append(paragraph(text))
         return self
 
     def text(self, text: str) -> 'MarkdownBuilder':
-        self.content += text
+        self.parts.append(text)
         return self
 
     def inline_link(self, text: str, url: str) -> 'MarkdownBuilder':
-        self.content += f"[{text}]({url})"
+        self.parts.append(inline_link(text, url))
         return self
 
     def link(self, text: str, url: str, description: str = "") -> 'MarkdownBuilder':
-        self.content += f"[{text}]({url}){f' {description}' if description else ''}\n"
+        self.parts.append(link(text, url, description))
         return self
 
     def image(self, url: str, alt_text: str = "") -> 'MarkdownBuilder':
-        self.content += f"![{alt_text}]({url})\n\n"
+        self.parts.append(image(url, alt_text))
         return self
 
     def ordered_list(self, item: str) -> 'MarkdownBuilder':
-        self.content += f"1. {item}\n"
+        self.parts.append(ordered_list(item))
         return self
 
     def unordered_list(self, item: str) -> 'MarkdownBuilder':
-        self.content += f"- {item}\n"
+        self.parts.append(unordered_list(item))
         return self
 
     def linebreak(self) -> 'MarkdownBuilder':
-        self.content += "\n"
+        self.parts.append("\n")
         return self
 
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    def _bounds(self) -> slice:
+        """Return the fragments left once surrounding whitespace is stripped."""
+        start = 0
+        while start < len(self.parts) and not self.parts[start].strip():
+            start += 1
+        stop = len(self.parts)
+        while stop > start and not self.parts[stop - 1].strip():
+            stop -= 1
+        return slice(start, stop)
+
     def build(self) -> str:
-        return self.content.strip()
\ No newline at end of file
+        return "".join(self.parts).strip()
+
+    def write_to(self, fp: TextIO) -> None:
+        """Write the same text as `build` to `fp` without joining it in memory."""
+        parts = self.parts[self._bounds()]
+        if not parts:
+            return
+        if len(parts) == 1:
+            fp.write(parts[0].strip())
+            return
+        fp.write(parts[0].lstrip())
+        fp.writelines(parts[1:-1])
+        fp.write(parts[-1].rstrip())
\ No newline at end of file
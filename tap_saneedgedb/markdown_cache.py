@@ -0,0 +1,127 @@
+"""On-disk cache of markdown converted from `child_blocks`."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, List, Optional
+
+DEFAULT_MAX_MB = 256
+
+# Bump whenever `convert_blocks_to_markdown` output changes, so that entries
+# written by an older version are never reused.
+CACHE_VERSION = 1
+
+_SCHEMA = """
+create table if not exists markdown (
+    key text primary key,
+    markdown text not null,
+    size integer not null,
+    last_used integer not null
+)
+"""
+
+
+class MarkdownCache:
+    """Size-bounded LRU cache of markdown keyed by a hash of the raw blocks.
+
+    Entries live in a SQLite database, so they are reused across runs. Once
+    closed, the least recently used entries are evicted until the total size of
+    the cached markdown fits in `max_bytes`. The cache may be shared by several
+    threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "markdown_cache.sqlite")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Imported on first use, so that runs without a markdown cache directory never
+        # load SQLite.
+        import sqlite3
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+        # Logical clock ordering entries by last use, carried over from the
+        # previous runs.
+        (self._clock,) = self._connection.execute(
+            "select coalesce(max(last_used), 0) from markdown"
+        ).fetchone()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @staticmethod
+    def key(child_blocks: List[Any], unknown_blocks: str = "") -> str:
+        """Return the cache key of a node's raw `child_blocks`.
+
+        `unknown_blocks` is the serializer's policy for unknown blocks, which
+        changes the markdown of nodes holding any.
+        """
+        payload = json.dumps(
+            [CACHE_VERSION, unknown_blocks, child_blocks], sort_keys=True, default=str
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "select markdown from markdown where key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute(
+                "update markdown set last_used = ? where key = ?", (self._tick(), key)
+            )
+            return row[0]
+
+    def put(self, key: str, markdown: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "insert or replace into markdown values (?, ?, ?, ?)",
+                (key, markdown, len(markdown.encode()), self._tick()),
+            )
+
+    def evict(self) -> int:
+        """Drop the least recently used entries beyond `max_bytes`.
+
+        Returns:
+            The number of evicted entries.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                """
+                delete from markdown where key in (
+                    select key from (
+                        select key, sum(size) over (
+                            order by last_used desc
+                        ) as total
+                        from markdown
+                    )
+                    where total > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+            self._connection.commit()
+            return cursor.rowcount
+
+    def close(self, logger: logging.Logger) -> None:
+        """Evict, persist the cache and log its hit and miss counters."""
+        evicted = self.evict()
+        with self._lock:
+            self._connection.close()
+        logger.info(
+            "Markdown cache: %d hits, %d misses, %d entries evicted.",
+            self.hits,
+            self.misses,
+            evicted,
+        )
@@ -1,66 +1,161 @@
-from typing import List, Union, Any
-from tap_saneedgedb.markdown_builder import MarkdownBuilder
-
-def is_empty(value: Any) -> bool:
-    return isinstance(value, dict) and len(value) == 0
-
-def convert_blocks_to_markdown(child_blocks: List[Any]) -> str:
-    if not child_blocks or len(child_blocks) == 0:
-        return ""
-    
-    content = MarkdownBuilder()
-    raw_blocks = [b for b in child_blocks if b is not None and b.get('block_data') != "{}"]
-    
-    for raw_block in raw_blocks:
+import enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from tap_saneedgedb import markdown_builder as md
+
+FILE_UPLOADS_URL = "https://dev-file-uploads.s3.us-east-2.amazonaws.com"
+
+
+class UnknownBlockPolicy(str, enum.Enum):
+    """What to do with a block the serializer cannot convert."""
+
+    SKIP = "skip"
+    PLACEHOLDER = "placeholder"
+    FAIL = "fail"
+
+
+DEFAULT_UNKNOWN_BLOCK_POLICY = UnknownBlockPolicy.PLACEHOLDER
+
+
+class UnknownBlockError(ValueError):
+    """Raised for a block the serializer cannot convert, with the `fail` policy."""
+
+
+# Items of a list-valued `block_data`, keyed by their type. Items with an
+# `imageSrc` are images, whatever their type.
+
+def _text_item(item: dict) -> Optional[str]:
+    if item.get('isHeading'):
+        return md.h3(item['content'])
+    if item.get('isBulletListItem'):
+        return md.unordered_list(item['text'])
+    if item.get('isNumberedListItem'):
+        return md.ordered_list(item['text'])
+    return item['text']
+
+
+def _pdf_item(item: dict) -> Optional[str]:
+    return md.link(
+        item.get('originalFilename', item['pdfFileKey']),
+        f"{FILE_UPLOADS_URL}/{item['pdfFileKey']}",
+    )
+
+
+def _image_item(item: dict) -> Optional[str]:
+    return md.image(item['imageSrc'])
+
+
+def _link_item(item: dict) -> Optional[str]:
+    if isinstance(item['content'], list) and len(item['content']) > 0:
+        return md.inline_link(item['content'][0]['text'], item['href'])
+    return md.inline_link(item['href'], item['href'])
+
+
+ITEM_RENDERERS: Dict[str, Callable[[dict], Optional[str]]] = {
+    'text': _text_item,
+    'pdf': _pdf_item,
+    'image': _image_item,
+    'link': _link_item,
+}
+
+
+def _item_type(item: Any) -> Any:
+    if not isinstance(item, dict):
+        return type(item).__name__
+    return 'image' if 'imageSrc' in item else item.get('type')
+
+
+# Dict-valued `block_data` has no type, so each kind is recognised by a
+# predicate, tried in order. Blocks matching none are paragraphs.
+
+def _image_block(block_data: dict) -> Optional[str]:
+    src = block_data['imageSrc']
+    if isinstance(src, dict):
+        src = src.get('filename', src)
+    return None if src is None else md.image(src)
+
+
+def _paragraph_block(block_data: dict) -> Optional[str]:
+    return md.paragraph(block_data['text'])
+
+
+BLOCK_RENDERERS: List[Tuple[str, Callable[[dict], Any], Callable[[dict], Optional[str]]]] = [
+    ('bullet_list_item', lambda b: b.get('isBulletListItem'),
+     lambda b: md.unordered_list(b['content'])),
+    ('numbered_list_item', lambda b: b.get('isNumberedListItem'),
+     lambda b: md.ordered_list(b['content'])),
+    ('heading', lambda b: b.get('isHeading'), lambda b: md.h3(b['content'])),
+    ('image', lambda b: 'imageSrc' in b, _image_block),
+    ('youtube', lambda b: b.get('youtubeSrc'), lambda b: md.link("", b['youtubeSrc'])),
+    ('weblink', lambda b: b.get('type') == 'weblink',
+     lambda b: md.link(b['title'], b['url'], b['description'])),
+    ('pdf', lambda b: b.get('pdfFileKey'),
+     lambda b: md.link(b['originalFilename'], f"{FILE_UPLOADS_URL}/{b['pdfFileKey']}")),
+    ('paragraph', lambda b: True, _paragraph_block),
+]
+
+
+def _render(
+    renderer: Optional[Callable[[dict], Optional[str]]],
+    data: Any,
+    kind: Any,
+    policy: UnknownBlockPolicy,
+) -> Optional[str]:
+    if renderer is not None:
+        try:
+            return renderer(data)
+        except (KeyError, IndexError, TypeError, AttributeError):
+            # Malformed blocks are handled like unknown ones.
+            pass
+    if policy == UnknownBlockPolicy.FAIL:
+        raise UnknownBlockError(f"Unexpected block type: {kind}")
+    if policy == UnknownBlockPolicy.PLACEHOLDER:
+        return f"<!-- unsupported block: {kind} -->\n"
+    return None
+
+
+def iter_markdown(
+    child_blocks: Optional[List[Any]],
+    unknown_blocks: UnknownBlockPolicy = DEFAULT_UNKNOWN_BLOCK_POLICY,
+) -> Iterator[str]:
+    """Yield the markdown fragments of a node's `child_blocks`.
+
+    The blocks are only read, never copied or modified. Blocks that cannot be
+    converted are skipped, replaced by an HTML comment, or raise
+    `UnknownBlockError`, depending on `unknown_blocks`.
+    """
+    policy = UnknownBlockPolicy(unknown_blocks)
+    for raw_block in child_blocks or ():
+        if raw_block is None:
+            continue
         block_data = raw_block.get('block_data')
-        if isinstance(block_data, list) and len(block_data) > 0:
-            for block in block_data:
-                if 'imageSrc' in block:
-                    block['type'] = 'image'
-                if block['type'] == 'text':
-                    if block.get('isHeading'):
-                        content.h3(block['content'])
-                    elif block.get('isBulletListItem'):
-                        content.unordered_list(block['text'])
-                    elif block.get('isNumberedListItem'):
-                        content.ordered_list(block['text'])
-                    else:
-                        content.text(block['text'])
-                elif block['type'] == 'pdf':
-                    content.link(block.get('originalFilename', block['pdfFileKey']), 
-                                 f"https://dev-file-uploads.s3.us-east-2.amazonaws.com/{block['pdfFileKey']}")
-                elif block['type'] == 'image':
-                    content.image(block['imageSrc'])
-                elif block['type'] == 'link':
-                    if isinstance(block['content'], list) and len(block['content']) > 0:
-                        content.inline_link(block['content'][0]['text'], block['href'])
-                    else:
-                        content.inline_link(block['href'], block['href'])
-                else:
-                    raise ValueError("Unexpected block type")
+        if not block_data or block_data == "{}":
+            continue
+
+        if isinstance(block_data, list):
+            for item in block_data:
+                item_type = _item_type(item)
+                fragment = _render(ITEM_RENDERERS.get(item_type), item, item_type, policy)
+                if fragment:
+                    yield fragment
             continue
-        
-        if block_data.get('isBulletListItem'):
-            content.unordered_list(block_data['content'])
-        elif block_data.get('isNumberedListItem'):
-            content.ordered_list(block_data['content'])
-        elif block_data.get('isHeading'):
-            content.h3(block_data['content'])
-        elif 'imageSrc' in block_data:
-            src = block_data['imageSrc'].get('filename', block_data['imageSrc'])
-            if src is None:
-                continue
-            content.image(src)
-        elif block_data.get('youtubeSrc'):
-            content.link("", block_data['youtubeSrc'])
-        elif block_data.get('type') == 'weblink':
-            content.link(block_data['title'], block_data['url'], block_data['description'])
-        elif block_data.get('pdfFileKey'):
-            content.link(block_data['originalFilename'], f"https://dev-file-uploads.s3.us-east-2.amazonaws.com/{block_data['pdfFileKey']}")
-        else:
-            if isinstance(block_data, list) and len(block_data) == 0:
-                continue
-            paragraph = block_data[0]['text'] if isinstance(block_data, list) else ("" if is_empty(block_data) else block_data['text'])
-            content.paragraph(paragraph)
-    
-    return content.build()
\ No newline at end of file
+
+        if not isinstance(block_data, dict):
+            fragment = _render(None, block_data, type(block_data).__name__, policy)
+            if fragment:
+                yield fragment
+            continue
+
+        for kind, matches, renderer in BLOCK_RENDERERS:
+            if matches(block_data):
+                fragment = _render(renderer, block_data, kind, policy)
+                if fragment:
+                    yield fragment
+                break
+
+
+def convert_blocks_to_markdown(
+    child_blocks: Optional[List[Any]],
+    unknown_blocks: UnknownBlockPolicy = DEFAULT_UNKNOWN_BLOCK_POLICY,
+) -> str:
+    return "".join(iter_markdown(child_blocks, unknown_blocks)).strip()
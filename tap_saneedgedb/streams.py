@@ -2,16 +2,57 @@
 
 from __future__ import annotations
 
+import dataclasses
+import json
+import operator
 import sys
+import time
 import typing as t
+import uuid
+import functools
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
-from singer_sdk import Tap, Stream
-import edgedb
-from datetime import datetime, timezone
+from singer_sdk import Stream, metrics
+from singer_sdk._singerlib import SchemaMessage
+from singer_sdk.batch import Batcher
+from singer_sdk.helpers._batch import (
+    BaseBatchFileEncoding,
+    BatchConfig,
+    SDKBatchMessage,
+)
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.mapper import StreamMap
+from singer_sdk.helpers._typing import (
+    TypeConformanceLevel,
+    conform_record_data_types,
+    to_json_compatible,
+)
+import pendulum
+from datetime import datetime, timedelta, timezone
 
+from tap_saneedgedb import concurrency, digest_index, instrumentation, tuning
 from tap_saneedgedb.client import SaneEdgedbTapStream
-from tap_saneedgedb.rich_text_serializer import convert_blocks_to_markdown
+from tap_saneedgedb.rich_text_serializer import (
+    DEFAULT_UNKNOWN_BLOCK_POLICY,
+    UnknownBlockPolicy,
+    convert_blocks_to_markdown,
+)
+
+if t.TYPE_CHECKING:
+    import edgedb
 
 if sys.version_info >= (3, 9):
     import importlib.resources as importlib_resources
@@ -20,29 +61,698 @@ else:
 
 SCHEMAS_DIR = importlib_resources.files(__package__) / "schemas"
 
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_START_DATE = datetime(2022, 1, 1, tzinfo=timezone.utc)
+# Smallest possible uuid, used as the keyset tie-breaker for the first page so
+# that every record sharing the starting replication key value is included.
+NIL_UUID = uuid.UUID(int=0)
+# Limit of the preflight count query, which counts the rows of every page.
+MAX_LIMIT = 2**62
+# State key holding the `id` of the last record written with the bookmark's
+# replication key value, so that a sync resumes right after it.
+TIEBREAKER = "replication_key_tiebreaker"
+# Partition key and record property naming the target in `edgedb_targets` the
+# records were extracted from.
+SOURCE_KEY = "_sdc_source"
+# Property of relationship stream records holding the replication key value of
+# the parent record they were read from.
+PARENT_VERSION_KEY = "_sdc_parent_version"
+
 class EdgeDbStream(Stream):
     primary_keys = ["id"]   
     is_sorted = True
 
-    def __init__(self, tap: Tap):
-        super().__init__(tap)
-        self.logger.info("Connecting to Edgedb instance", self.config.get('edgedb_host'))
-        self.client = edgedb.create_client(
-            host = self.config.get('edgedb_host'),
-            port = self.config.get('edgedb_port'),
-            user = self.config.get('edgedb_user'),
-            password = self.config.get('edgedb_password'),
-            secret_key = self.config.get('edgedb_secret_key'),
-            database = self.config.get('edgedb_database'),
-            tls_security = self.config.get('edgedb_client_tls_security'),
+    # EdgeQL for a single page of records, with a `{shape}` placeholder for the
+    # shape of its final `select`. It must accept the `$last_updated`,
+    # `$last_id` and `$limit` parameters, plus any returned by
+    # `get_query_parameters`, and order by the replication key then `.id`, so
+    # that pages can be fetched with keyset pagination. The ordering must not
+    # refer to the shape, which differs with `json_passthrough`.
+    query_template: str
+    # Shape element of the final `select` computing each record property, as
+    # `name := expression`. The result attribute `name` becomes the property.
+    columns: Dict[str, str]
+    # Properties left out of the digests of the records, so that records only
+    # differing in them are dropped when `digest_index_dir` is set.
+    digest_ignored_properties: Tuple[str, ...] = ()
+
+    # Pages fetched by another thread, set while the stream is synced
+    # concurrently with the tap's other streams. A `None` entry marks the end
+    # of a partition.
+    _prefetched_pages: Optional[Deque[Optional[List[dict]]]] = None
+    # Pages of each partition, keyed by `_partition_key`, when partitions are
+    # fetched ahead by worker threads.
+    _partition_pages: Optional[Dict[tuple, Iterator[List[dict]]]] = None
+    # Set while records are written to batch files instead of stdout.
+    _batching = False
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.extraction_metrics = instrumentation.StreamMetrics(self.name)
+        if self.config.get("skip_nested_conformance"):
+            self.TYPE_CONFORMANCE_LEVEL = TypeConformanceLevel.ROOT_ONLY
+
+    def get_client(self, context: Optional[dict]) -> edgedb.Client:
+        """Return the EdgeDB client of the target `context` belongs to."""
+        return self._tap.get_edgedb_client((context or {}).get(SOURCE_KEY))
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        if self._tap.edgedb_targets:
+            return self.target_partitions(None)
+        return super().partitions
+
+    def target_partitions(self, partitions: Optional[List[dict]]) -> Optional[List[dict]]:
+        """Repeat `partitions` for each target in `edgedb_targets`, if any.
+
+        Every target then keeps its own bookmarks, and the SDK adds the target
+        to each record as `_sdc_source`.
+        """
+        targets = self._tap.edgedb_targets
+        if not targets:
+            return partitions
+        return [
+            {SOURCE_KEY: target, **partition}
+            for target in targets
+            for partition in partitions or [{}]
+        ]
+
+    def get_required_properties(self) -> Set[str]:
+        """Return the properties fetched even when they are deselected."""
+        required = {*self.primary_keys, self.replication_key}
+        for child in self.child_streams:
+            if child.selected or child.has_selected_descendents:
+                required.add(child.parent_property)
+        return required
+
+    @cached_property
+    def fetched_properties(self) -> List[str]:
+        """Properties selected in the catalog, plus the required ones.
+
+        Deselected properties are left out of `query`, so they are never
+        fetched from EdgeDB.
+        """
+        required = self.get_required_properties()
+        return [
+            name
+            for name in self.columns
+            if name in required or self.mask[("properties", name)]
+        ]
+
+    @cached_property
+    def query(self) -> str:
+        """`query_template` selecting only `fetched_properties`."""
+        shape = ",\n        ".join(self.columns[name] for name in self.fetched_properties)
+        return self.query_template.replace("{shape}", "{\n        %s\n    }" % shape)
+
+    @cached_property
+    def json_query(self) -> str:
+        """`query` naming the shape elements after the record properties.
+
+        Used with `json_passthrough`, so that the rows EdgeDB encodes as JSON
+        already are records.
+        """
+        shape = ",\n        ".join(
+            # Objects have an `id` already, which cannot be redefined.
+            "id" if name == "id" else f"{name} := {self.columns[name].split(':=', 1)[1].strip()}"
+            for name in self.fetched_properties
+        )
+        return self.query_template.replace("{shape}", "{\n        %s\n    }" % shape)
+
+    @cached_property
+    def _get_values(self) -> Callable[[edgedb.Object], tuple]:
+        # A single getter per stream, reading every fetched attribute at once.
+        return operator.attrgetter(
+            *(self.columns[name].split(":=")[0].strip() for name in self.fetched_properties)
+        )
+
+    def _observe_query(self, seconds: float, rows: int, context: Dict) -> None:
+        self.extraction_metrics.add_query(seconds, rows)
+        tags = {metrics.Tag.STREAM: self.name, "rows": rows}
+        if context:
+            tags[metrics.Tag.CONTEXT] = context
+        self._log_metric(
+            metrics.Point("timer", instrumentation.Metric.QUERY_DURATION, seconds, tags)
+        )
+
+    def log_sync_costs(self) -> None:
+        super().log_sync_costs()
+        self.extraction_metrics.log(self.metrics_logger)
+        estimate = self.__dict__.get("estimate")
+        if estimate is not None:
+            synced = self.extraction_metrics
+            self.logger.info(
+                "Estimated %d rows of %.0f bytes, synced %d rows of %.0f bytes.",
+                estimate.rows,
+                estimate.bytes_per_row,
+                synced.rows,
+                synced.decoded_bytes / synced.rows if synced.rows else 0.0,
+            )
+
+    @cached_property
+    def estimate(self) -> tuning.Estimate:
+        """Estimate the rows still to sync with a count and a sample query.
+
+        The count starts at the earliest bookmark of the partitions of each
+        target, so partitioned streams may be overestimated.
+        """
+        # The earliest bookmark of each target.
+        last_updated: Dict[Optional[str], datetime] = {}
+        for context in self.partitions or [None]:
+            target = (context or {}).get(SOURCE_KEY)
+            value = self.get_last_updated(context)
+            last_updated[target] = min(last_updated.get(target, value), value)
+        clients = {
+            target: self.get_client({SOURCE_KEY: target}) for target in last_updated
+        }
+        parameters = dict(last_id=NIL_UUID, **self.get_query_parameters(None))
+        rows = sum(
+            clients[target].query_single(
+                f"select count(({self.query}))",
+                limit=MAX_LIMIT,
+                last_updated=value,
+                **parameters,
+            )
+            for target, value in last_updated.items()
+        )
+        # Targets are assumed to hold similar rows, so one of them is sampled.
+        target, value = next(iter(last_updated.items()))
+        started = time.perf_counter()
+        results = clients[target].query(
+            self.query, limit=tuning.SAMPLE_ROWS, last_updated=value, **parameters
+        )
+        seconds = time.perf_counter() - started
+        sample = [self.parse_result(result) for result in results]
+        return self.estimate_sample(rows, sample, seconds)
+
+    def estimate_sample(self, rows: int, sample: List[dict], seconds: float) -> tuning.Estimate:
+        if not sample:
+            return tuning.Estimate(rows=rows, bytes_per_row=0.0, seconds_per_row=0.0)
+        return tuning.Estimate(
+            rows=rows,
+            bytes_per_row=instrumentation.decoded_size(sample) / len(sample),
+            seconds_per_row=seconds / len(sample),
+        )
+
+    @cached_property
+    def plan(self) -> Optional[tuning.Plan]:
+        """Page size and worker counts picked from `estimate`, with `auto_tune`."""
+        if not self.config.get("auto_tune"):
+            return None
+        estimate = self.estimate
+        plan = tuning.plan(
+            estimate,
+            memory_budget=self.config.get(
+                "memory_budget_mb", tuning.DEFAULT_MEMORY_BUDGET_MB
+            ) * 1024 * 1024,
+            page_latency_budget=self.config.get(
+                "page_latency_budget", tuning.DEFAULT_PAGE_LATENCY_BUDGET
+            ),
+            max_workers=self.config.get(
+                "auto_tune_max_workers", tuning.DEFAULT_MAX_WORKERS
+            ),
+            max_partitions=len(self.partitions or [None]),
+            buffered_pages=self.config.get(
+                "concurrent_queue_size", concurrency.DEFAULT_QUEUE_SIZE
+            ),
+        )
+        self.logger.info(
+            "Estimated %d rows of %.0f bytes taking %.2f ms each: page size %d, "
+            "%d partition workers, %d markdown workers.",
+            estimate.rows,
+            estimate.bytes_per_row,
+            estimate.seconds_per_row * 1000,
+            plan.page_size,
+            plan.partition_workers,
+            plan.markdown_workers,
+        )
+        return plan
+
+    @property
+    def page_size(self) -> int:
+        if self.plan is not None:
+            return self.plan.page_size
+        return self.config.get("page_size", DEFAULT_PAGE_SIZE)
+
+    def get_page_sizer(self) -> tuning.AdaptivePageSize:
+        """Return the page size of a new run of `get_pages`.
+
+        Pages are always split after a query timeout. With `adaptive_page_size`,
+        they are also resized to the latency and memory budgets.
+        """
+        buffered_pages = self.config.get(
+            "concurrent_queue_size", concurrency.DEFAULT_QUEUE_SIZE
+        )
+        memory_budget = self.config.get(
+            "memory_budget_mb", tuning.DEFAULT_MEMORY_BUDGET_MB
+        ) * 1024 * 1024
+        return tuning.AdaptivePageSize(
+            self.page_size,
+            latency_budget=self.config.get(
+                "page_latency_budget", tuning.DEFAULT_PAGE_LATENCY_BUDGET
+            ),
+            # Shared by the pages each partition worker holds.
+            memory_budget=memory_budget / (self.partition_workers * (buffered_pages + 1)),
+            adapt=bool(self.config.get("adaptive_page_size")),
         )
 
+    @property
+    def partition_workers(self) -> int:
+        """Number of partitions fetched at the same time."""
+        if self.plan is not None:
+            return self.plan.partition_workers
+        return self.config.get("partition_workers") or 1
+
+    def get_start_date(self) -> datetime:
+        start_date = self.config.get("start_date")
+        if start_date is None:
+            return DEFAULT_START_DATE
+        return pendulum.parse(start_date).replace(tzinfo=timezone.utc)
+
     def get_last_updated(self, context: Dict) -> datetime:
         starting_timestamp: Optional[datetime] = self.get_starting_timestamp(context)
-        default_timestamp = datetime.strptime("2022-01-01T00:00:00Z", '%Y-%m-%dT%H:%M:%SZ')
-        timestamp = starting_timestamp if starting_timestamp is not None else default_timestamp
+        timestamp = starting_timestamp if starting_timestamp is not None else DEFAULT_START_DATE
         return timestamp.replace(tzinfo=timezone.utc)
 
+    def get_last_id(self, context: Dict, last_updated: datetime) -> uuid.UUID:
+        """Return the `id` to resume after among the records at `last_updated`.
+
+        The tie-breaker is only used when it was written along with a record
+        at exactly `last_updated`. Otherwise every such record is synced again.
+        """
+        tiebreaker = self.get_context_state(context).get(TIEBREAKER)
+        if tiebreaker is None:
+            return NIL_UUID
+        if pendulum.parse(tiebreaker["replication_key_value"]) != last_updated:
+            return NIL_UUID
+        return uuid.UUID(tiebreaker["id"])
+
+    def get_query_parameters(self, context: Dict) -> dict:
+        """Return query parameters besides those used for keyset pagination."""
+        return {}
+
+    def parse_result(self, result: edgedb.Object) -> dict:
+        """Map a single EdgeDB result object onto a stream record."""
+        return dict(zip(self.fetched_properties, self._get_values(result)))
+
+    def parse_json_result(self, record: dict) -> dict:
+        """Finish a record decoded from the output of `json_query`."""
+        return record
+
+    def get_pages(self, context: Dict) -> Iterable[List[dict]]:
+        """Yield pages of records using keyset pagination on (replication key, id).
+
+        Only one page is held in memory at a time. This only queries EdgeDB and
+        never touches the tap state, so it may run in a worker thread once the
+        starting replication value of `context` has been written.
+        """
+        # Loaded along with the client, see `client.create_edgedb_client`.
+        import edgedb
+
+        last_updated = self.get_last_updated(context)
+        last_id = self.get_last_id(context, last_updated)
+        page_sizer = self.get_page_sizer()
+        parameters = self.get_query_parameters(context)
+        client = self.get_client(context)
+        passthrough = self.config.get("json_passthrough")
+        retries = self.config.get("query_timeout_retries", tuning.DEFAULT_QUERY_TIMEOUT_RETRIES)
+        backoff = self.config.get("query_retry_backoff", tuning.DEFAULT_QUERY_RETRY_BACKOFF)
+        timeouts = 0
+        while True:
+            page_size = page_sizer.size
+            page_parameters = dict(
+                last_updated=last_updated,
+                last_id=last_id,
+                limit=page_size,
+                **parameters,
+            )
+            started = time.perf_counter()
+            try:
+                if passthrough:
+                    results = client.query_json(self.json_query, **page_parameters)
+                else:
+                    results = client.query(self.query, **page_parameters)
+            except edgedb.QueryTimeoutError:
+                # The next query covers the first half of the same keyset range.
+                timeouts += 1
+                if timeouts > retries or not page_sizer.split():
+                    raise
+                delay = backoff * 2 ** (timeouts - 1)
+                self.logger.warning(
+                    "Query of '%s' for %d rows timed out, retrying with %d rows in %.1f s.",
+                    self.name,
+                    page_size,
+                    page_sizer.size,
+                    delay,
+                )
+                time.sleep(delay)
+                continue
+            timeouts = 0
+            query_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            if passthrough:
+                page = [self.parse_json_result(row) for row in json.loads(results)]
+            else:
+                page = [self.parse_result(result) for result in results]
+            decode_seconds = time.perf_counter() - started
+            self._observe_query(query_seconds, len(page), context)
+            if not page:
+                return
+            size = self.extraction_metrics.add_decoded(
+                decode_seconds, page, len(results) if passthrough else None
+            )
+            reason = page_sizer.observe(len(page), query_seconds, size)
+            if reason is not None:
+                self.logger.info(
+                    "Page size of '%s' set to %d rows after a %s.",
+                    self.name,
+                    page_sizer.size,
+                    reason,
+                )
+            yield page
+            if len(page) < page_size:
+                return
+            last_updated = page[-1][self.replication_key]
+            last_id = page[-1]["id"]
+            if passthrough:
+                last_updated = pendulum.parse(last_updated)
+                last_id = uuid.UUID(last_id)
+
+    def get_records(self, context: Dict) -> Iterable[dict]:
+        if self._prefetched_pages is not None:
+            pages = _drain(self._prefetched_pages)
+        elif context is not None and self.partition_workers > 1:
+            pages = self._get_partition_pages(context)
+        else:
+            pages = self.get_pages(context)
+        if self._batching:
+            # Batches write their STATE once each batch file is complete, and
+            # the batch holding the page's records is written by then.
+            for page in pages:
+                yield from page
+                if page:
+                    self._set_tiebreaker(context, page[-1])
+            return
+
+        every_records = self.config.get("state_checkpoint_records") or 0
+        every_seconds = self.config.get("state_checkpoint_seconds") or 0
+        for page in pages:
+            if not (every_records or every_seconds):
+                yield from page
+            else:
+                records = 0
+                checkpointed = time.monotonic()
+                for record in page:
+                    yield record
+                    # The SDK has written the record by the time the next one
+                    # is requested.
+                    records += 1
+                    if (every_records and records >= every_records) or (
+                        every_seconds and time.monotonic() - checkpointed >= every_seconds
+                    ):
+                        self._write_checkpoint(context, record)
+                        records = 0
+                        checkpointed = time.monotonic()
+            # Every record of the page has been written by now, so an
+            # interrupted run resumes from the last finished page.
+            if page:
+                self._write_checkpoint(context, page[-1])
+
+    def _set_tiebreaker(self, context: Dict, record: dict) -> None:
+        self.get_context_state(context)[TIEBREAKER] = {
+            "replication_key_value": to_json_compatible(record[self.replication_key]),
+            "id": str(record["id"]),
+        }
+        self._is_state_flushed = False
+
+    def _write_checkpoint(self, context: Dict, record: dict) -> None:
+        """Write a STATE message resuming right after `record`."""
+        self._set_tiebreaker(context, record)
+        self._write_state_message()
+
+    def get_batches(
+        self, batch_config: BatchConfig, context: Optional[dict] = None
+    ) -> Iterable[Tuple[BaseBatchFileEncoding, List[str]]]:
+        """Write the records to batch files, yielding the manifest of each.
+
+        Records are prepared the way the SDK prepares RECORD messages, so the
+        files hold exactly what the RECORD messages would have.
+        """
+        batcher = Batcher(
+            tap_name=self.tap_name,
+            stream_name=self.name,
+            batch_config=batch_config,
+        )
+        self._batching = True
+        try:
+            records = filter(
+                None,
+                map(
+                    self._prepare_batch_record,
+                    self._sync_records(context, write_messages=False),
+                ),
+            )
+            for manifest in batcher.get_batches(records=records):
+                yield batch_config.encoding, manifest
+        finally:
+            self._batching = False
+
+    def _prepare_batch_record(self, record: dict) -> Optional[dict]:
+        """Prepare `record` for a batch file, or return `None` to drop it."""
+        digest_key = self._digest_key(record)
+        pop_deselected_record_properties(record, self.schema, self.mask)
+        record = conform_record_data_types(
+            stream_name=self.name,
+            record=record,
+            schema=self.schema,
+            level=self.TYPE_CONFORMANCE_LEVEL,
+            logger=self.logger,
+        )
+        # Parquet files cannot hold UUIDs, which JSON writes as strings.
+        record = {key: _stringify_uuids(value) for key, value in record.items()}
+        if self._is_unchanged(digest_key, [record]):
+            return None
+        return record
+
+    def _write_record_message(self, record: dict) -> None:
+        if self._tap.digest_index is None:
+            super()._write_record_message(record)
+            return
+        digest_key = self._digest_key(record)
+        messages = list(self._generate_record_messages(record))
+        if not self._is_unchanged(digest_key, [message.record for message in messages]):
+            for message in messages:
+                self._tap.write_message(message)
+        # The bookmark moves past dropped records too.
+        self._is_state_flushed = False
+
+    def _write_state_message(self) -> None:
+        index = self._tap.digest_index
+        if index is None or self._is_state_flushed or not index.pending:
+            super()._write_state_message()
+            return
+        # The STATE message covers every record written so far, so the digests
+        # of those records are committed once it is written.
+        self.stream_state[digest_index.GENERATION_KEY] = index.generation
+        super()._write_state_message()
+        index.commit()
+
+    def _digest_key(self, record: dict) -> str:
+        if SOURCE_KEY in record:
+            return f"{record[SOURCE_KEY]}/{record['id']}"
+        return str(record["id"])
+
+    def _is_unchanged(self, key: str, records: List[dict]) -> bool:
+        """Return whether the records written for `key` match the last ones.
+
+        Deletion streams share the index entries of their source stream, so a
+        restored object is written again after its tombstone.
+        """
+        index = self._tap.digest_index
+        if index is None:
+            return False
+        if self.digest_ignored_properties:
+            records = [
+                {
+                    name: value
+                    for name, value in record.items()
+                    if name not in self.digest_ignored_properties
+                }
+                for record in records
+            ]
+        unchanged = index.unchanged(
+            self.stream_maps[0].stream_alias, key, index.digest(records)
+        )
+        if unchanged:
+            self.extraction_metrics.add_suppressed()
+        return unchanged
+
+    def _write_starting_replication_values(self) -> List[Optional[dict]]:
+        """Write the starting replication value of every partition.
+
+        This has to happen on the syncing thread before worker threads call
+        `get_pages`, since the SDK otherwise only writes it as each partition
+        begins.
+
+        Returns:
+            The stream's partitions, or `[None]` if it has none.
+        """
+        partitions = self.partitions or [None]
+        for context in partitions:
+            self._write_starting_replication_value(context)
+        return partitions
+
+    def _fetch_partitions(
+        self, partitions: List[Optional[dict]]
+    ) -> List[Iterable[List[dict]]]:
+        """Return the pages of each partition, fetched ahead if configured."""
+        sources = [self.get_pages(context) for context in partitions]
+        if self.partition_workers <= 1 or len(sources) <= 1:
+            return sources
+        return concurrency.prefetch(
+            sources,
+            max_workers=self.partition_workers,
+            queue_size=self.config.get(
+                "concurrent_queue_size", concurrency.DEFAULT_QUEUE_SIZE
+            ),
+        )
+
+    def _get_partition_pages(self, context: dict) -> Iterator[List[dict]]:
+        if self._partition_pages is None:
+            partitions = self._write_starting_replication_values()
+            self._partition_pages = {
+                _partition_key(partition): pages
+                for partition, pages in zip(
+                    partitions, self._fetch_partitions(partitions)
+                )
+            }
+        return self._partition_pages.pop(_partition_key(context))
+
+    def iter_partition_pages(self) -> Iterator[Optional[List[dict]]]:
+        """Yield the pages of every partition in turn, each followed by `None`."""
+        partitions = self.partitions or [None]
+        for pages in self._fetch_partitions(partitions):
+            yield from pages
+            yield None
+
+    def start_prefetched_sync(
+        self, pages: Deque[Optional[List[dict]]]
+    ) -> Iterator[dict]:
+        """Start syncing this stream from pages fetched by another thread.
+
+        This mirrors the preamble of `Stream.sync` and returns the record sync
+        generator. `pages` is filled from `iter_partition_pages`. Each `next()`
+        call on the generator writes exactly one record taken from `pages`, and
+        a partition finishes once its `None` marker is reached, so the caller
+        must only advance it as far as the pages it has appended.
+        """
+        self.logger.info(
+            "Beginning %s sync of '%s'...", self.replication_method.lower(), self.name
+        )
+        signpost = self.get_replication_key_signpost(None)
+        if signpost:
+            self._write_replication_key_signpost(None, signpost)
+        self._write_starting_replication_values()
+        self._write_schema_message()
+        self._prefetched_pages = pages
+        return self._sync_records()
+
+
+def _drain(pages: Deque[Optional[List[dict]]]) -> Iterator[List[dict]]:
+    while pages:
+        page = pages.popleft()
+        if page is None:
+            return
+        yield page
+
+
+def _timed_convert(
+    unknown_blocks: UnknownBlockPolicy, child_blocks: List[dict]
+) -> Tuple[str, float]:
+    """Convert blocks to markdown, also returning the time it took.
+
+    Defined at module level so that it can run in the markdown process pool.
+    """
+    started = time.perf_counter()
+    markdown = convert_blocks_to_markdown(child_blocks, unknown_blocks)
+    return markdown, time.perf_counter() - started
+
+
+def _decode_json(value: Any) -> Any:
+    """Decode a `json` value, which the EdgeDB client returns as a string."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _stringify_uuids(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, list):
+        return [_stringify_uuids(item) for item in value]
+    return value
+
+
+def _with_source(child_context: dict, record: dict) -> dict:
+    """Hand the target of `record`, if any, over to child streams."""
+    if SOURCE_KEY in record:
+        child_context[SOURCE_KEY] = record[SOURCE_KEY]
+    return child_context
+
+
+def _partition_key(context: dict) -> tuple:
+    return tuple(sorted(context.items()))
+
+
+class RelationshipStream(Stream):
+    """Edges of a relationship, read from the id array of each parent record.
+
+    The parent query already aggregates the ids, so syncing the edges costs no
+    extra query. Child streams only sync for the parent records emitted by a
+    run, so incremental runs only send the edges of changed parents. Deselect
+    the array property of the parent stream to keep its records small.
+
+    The edges of a parent replace those of its previous syncs. Every edge holds
+    the parent's replication key value as `_sdc_parent_version`, and each sync
+    of a parent also writes a marker with an empty related id, so targets can
+    delete the edges older than a parent's latest marker, even once it has no
+    edges left.
+
+    Parents hand over the record being processed as `relationship_source` in
+    `get_child_context`, right before the SDK syncs their children.
+    """
+
+    # All parents share a single bookmark-less state entry, rather than one
+    # state partition per parent record.
+    state_partitioning_keys = []
+    # Property of the parent record holding the related ids.
+    parent_property: str
+    # Record properties holding the parent id and the related id.
+    parent_key: str
+    related_key: str
+
+    def get_batch_config(self, config: t.Mapping) -> Optional[BatchConfig]:
+        # A child stream syncs once per parent record, so batching would write
+        # a file per parent. The edges are written as RECORD messages instead.
+        return None
+
+    def get_records(self, context: Dict) -> Iterable[dict]:
+        parent = self._tap.streams[self.parent_stream_type.name]
+        parent_id = context[self.parent_key]
+        source = {SOURCE_KEY: context[SOURCE_KEY]} if SOURCE_KEY in context else {}
+        version = parent.relationship_source[parent.replication_key]
+        yield {
+            self.parent_key: parent_id,
+            self.related_key: "",
+            PARENT_VERSION_KEY: version,
+            **source,
+        }
+        for related_id in parent.relationship_source.get(self.parent_property) or ():
+            yield {
+                self.parent_key: parent_id,
+                self.related_key: str(related_id),
+                PARENT_VERSION_KEY: version,
+                **source,
+            }
+
 class UserModelStream(EdgeDbStream):
     name = "sane_users"
     replication_key = "created"
@@ -52,59 +762,61 @@ class UserModelStream(EdgeDbStream):
         th.Property("bio", th.StringType),
         th.Property("created", th.DateTimeType),
         th.Property("deletion", th.BooleanType),
-        th.Property("spaces", th.StringType),
-        th.Property("following", th.StringType),
+        th.Property("spaces", th.ArrayType(th.StringType)),
+        th.Property("following", th.ArrayType(th.StringType)),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
+        th.Property(SOURCE_KEY, th.StringType),
     ).to_dict()
 
-    def get_records(self, context: Dict) -> Iterable[dict]:
-        last_updated = self.get_last_updated(context)
-        query = '''
-        with
-            users := (
-                select User {
-                    id,
-                    username,
-                    bio,
-                    account_created,
-                    account_deletion: {
-                        id
-                    },
-                    following: {
-                        id
-                    },
-                    spaces: {
-                        id
-                    }
+    query_template = '''
+    with
+        users := (
+            select User {
+                id,
+                username,
+                bio,
+                account_created,
+                account_deletion: {
+                    id
+                },
+                following: {
+                    id
+                },
+                spaces: {
+                    id
                 }
-                filter .account_created >= <datetime>$last_updated
-                and not exists .account_deletion
-                order by .account_created
-            )
-        select users {
-            user_id := users.id,
-            username := users.username,
-            bio := users.bio,
-            created := users.account_created,
-            deletion := exists(users.account_deletion),
-            space_list := array_agg(users.spaces.id),
-            following_list := array_agg(users.following.id)
-        }
-        '''
-        results = self.client.query(query, last_updated=last_updated)
-        for result in results:
-            yield {
-                "id": result.user_id,
-                "username": result.username,
-                "bio": result.bio,
-                "created": result.created,
-                "deletion": result.deletion,
-                "spaces": result.space_list,
-                "following": result.following_list,
             }
+            filter (
+                .account_created > <datetime>$last_updated
+                or (.account_created = <datetime>$last_updated and .id > <uuid>$last_id)
+            )
+            and not exists .account_deletion
+            order by .account_created then .id
+            limit <int64>$limit
+        )
+    select users {shape}
+    order by users.account_created then users.id
+    '''
+
+    columns = {
+        "id": "user_id := users.id",
+        "username": "username := users.username",
+        "bio": "bio := users.bio",
+        "created": "created := users.account_created",
+        "deletion": "deletion := exists(users.account_deletion)",
+        "spaces": "space_list := array_agg(users.spaces.id)",
+        "following": "following_list := array_agg(users.following.id)",
+    }
+
+    def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
+        self.relationship_source = record
+        return _with_source({"user_id": str(record["id"])}, record)
 
 class SpaceModelStream(EdgeDbStream):
     name = "sane_spaces"
     replication_key = "updated"
+    # Bumped by touches leaving every other property unchanged.
+    digest_ignored_properties = ("updated",)
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
         th.Property("title", th.StringType),
@@ -112,76 +824,74 @@ class SpaceModelStream(EdgeDbStream):
         th.Property("created", th.DateTimeType),
         th.Property("updated", th.DateTimeType),
         th.Property("deletion", th.BooleanType),
-        th.Property("nodes", th.StringType),
+        th.Property("nodes", th.ArrayType(th.StringType)),
         th.Property("owner", th.StringType),
-        th.Property("followers", th.StringType),
+        th.Property("followers", th.ArrayType(th.StringType)),
         th.Property("is_public", th.BooleanType),
         th.Property("categories", th.StringType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
+        th.Property(SOURCE_KEY, th.StringType),
     ).to_dict()
 
-    def get_records(self, context: Dict) -> Iterable[dict]:
-        last_updated = self.get_last_updated(context)
-        query = '''
-        WITH
-            spaces := (
-                select Space {
-                    id,
-                    title,
-                    description,
-                    created,
-                    updated,
-                    is_public,
-                    deletion: {
-                        id
-                    },
-                    owner: {
-                        id
-                    },
-                    nodes: {
-                        id
-                    },
-                    followers: {
-                        id
-                    },
-                    categories,
-                }
-                filter .updated >= <datetime>$last_updated
-                and not exists .deletion
-                order by .updated
-            )
-        SELECT spaces {
-            space_id := spaces.id,
-            title := spaces.title,
-            description := spaces.description,
-            created := spaces.created,
-            updated := spaces.updated,
-            deleted := exists(spaces.deletion),
-            is_public := spaces.is_public,
-            owner_id := spaces.owner.id,
-            nodes_list := array_agg(spaces.nodes.id),
-            followers_list := array_agg(spaces.followers.id),
-            categories := spaces.categories,
-        }
-        '''
-        results = self.client.query(query, last_updated=last_updated)
-        for result in results:
-            yield {
-                "id": result.id,
-                "title": result.title,
-                "description": result.description,
-                "created": result.created,
-                "updated": result.updated,
-                "is_public": result.is_public,
-                "deletion": result.deleted,
-                "owner": result.owner_id,
-                "nodes": result.nodes_list,
-                "followers": result.followers_list,
-                "categories": result.categories,
+    query_template = '''
+    WITH
+        spaces := (
+            select Space {
+                id,
+                title,
+                description,
+                created,
+                updated,
+                is_public,
+                deletion: {
+                    id
+                },
+                owner: {
+                    id
+                },
+                nodes: {
+                    id
+                },
+                followers: {
+                    id
+                },
+                categories,
             }
+            filter (
+                .updated > <datetime>$last_updated
+                or (.updated = <datetime>$last_updated and .id > <uuid>$last_id)
+            )
+            and not exists .deletion
+            order by .updated then .id
+            limit <int64>$limit
+        )
+    SELECT spaces {shape}
+    order by spaces.updated then spaces.id
+    '''
+
+    columns = {
+        "id": "space_id := spaces.id",
+        "title": "title := spaces.title",
+        "description": "description := spaces.description",
+        "created": "created := spaces.created",
+        "updated": "updated := spaces.updated",
+        "is_public": "is_public := spaces.is_public",
+        "deletion": "deleted := exists(spaces.deletion)",
+        "owner": "owner_id := spaces.owner.id",
+        "nodes": "nodes_list := array_agg(spaces.nodes.id)",
+        "followers": "followers_list := array_agg(spaces.followers.id)",
+        "categories": "categories := spaces.categories",
+    }
+
+    def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
+        self.relationship_source = record
+        return _with_source({"space_id": str(record["id"])}, record)
 
 class SpaceNodeModelStream(EdgeDbStream):
     name = "sane_space_nodes"
     replication_key = "updated"
+    # Bumped by touches leaving every other property unchanged.
+    digest_ignored_properties = ("updated",)
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
         th.Property("space_id", th.StringType),
@@ -195,72 +905,457 @@ class SpaceNodeModelStream(EdgeDbStream):
         th.Property("node_type", th.StringType),
         th.Property("node_url", th.StringType),
         th.Property("categories", th.StringType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
+        th.Property(SOURCE_KEY, th.StringType),
     ).to_dict()
 
-    def get_records(self, context: Dict) -> Iterable[dict]:
-        last_updated = self.get_last_updated(context)
-        query = '''
-        WITH
-            nodes := (
-                select Node {
+    query_template = '''
+    WITH
+        nodes := (
+            select Node {
+                id,
+                title,
+                updated,
+                created,
+                node_content,
+                node_url,
+                node_type,
+                deletion: {
+                    id
+                },
+                creator: {
+                    id
+                },
+                owning_space: {
                     id,
-                    title,
-                    updated,
-                    created,
-                    node_content,
-                    node_url,
-                    node_type,
-                    deletion: {
-                        id
-                    },
-                    creator: {
+                    owner: {
                         id
-                    },
-                    child_blocks: {
-                        block_type,
-                        block_data
-                    },
-                    owning_space: {
-                        id,
-                        owner: {
-                            id
-                        }
-                    },
-                    categories,
-                }
-                filter .updated >= <datetime>$last_updated
-                and not exists .deletion
-                and not exists .owning_space.deletion
-                order by .updated
+                    }
+                },
+                categories,
+            }
+            filter (
+                .updated > <datetime>$last_updated
+                or (.updated = <datetime>$last_updated and .id > <uuid>$last_id)
             )
-        SELECT nodes {
-            node_id := nodes.id,
-            space_id := nodes.owning_space.id,
-            user_id := nodes.owning_space.owner.id,
-            title := nodes.title,
-            created := nodes.created,
-            updated := nodes.updated,
-            deleted := exists(nodes.deletion),
-            node_content := nodes.node_content ?? "",
-            node_type := nodes.node_type,
-            node_url := nodes.node_url ?? "",
-            child_blocks := nodes.child_blocks { block_type, block_data },
-            categories := nodes.categories,
+            and ((.updated < <optional datetime>$updated_before) ?? true)
+            and not exists .deletion
+            and not exists .owning_space.deletion
+            order by .updated then .id
+            limit <int64>$limit
+        )
+    SELECT nodes {shape}
+    order by nodes.updated then nodes.id
+    '''
+
+    columns = {
+        "id": "node_id := nodes.id",
+        "space_id": "space_id := nodes.owning_space.id",
+        "user_id": "user_id := nodes.owning_space.owner.id",
+        "title": "title := nodes.title",
+        "deletion": "deleted := exists(nodes.deletion)",
+        "created": "created := nodes.created",
+        "updated": "updated := nodes.updated",
+        # Only Text nodes are converted to markdown, and empty blocks are
+        # skipped by the serializer, so neither is sent over the wire.
+        "child_blocks": '''child_blocks := (
+            select nodes.child_blocks { block_type, block_data }
+            filter nodes.node_type = "Text"
+            and .block_data != to_json('{}')
+        )''',
+        "node_content": 'node_content := nodes.node_content ?? ""',
+        "node_type": "node_type := nodes.node_type",
+        "node_url": 'node_url := nodes.node_url ?? ""',
+        "categories": "categories := nodes.categories",
+    }
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        """Split the stream into fixed `updated` time windows, if configured.
+
+        Windows are aligned on the start date, so they stay the same from one
+        run to the next and each one keeps its own bookmark. The last window
+        ends after the current time, and new windows are added as time passes.
+        """
+        window_days = self.config.get("space_nodes_partition_days")
+        if not window_days:
+            return super().partitions
+        window = timedelta(days=window_days)
+        window_start = self.get_start_date()
+        now = datetime.now(timezone.utc)
+        partitions = []
+        while window_start <= now:
+            window_end = window_start + window
+            partitions.append({
+                "updated_from": window_start.isoformat(),
+                "updated_before": window_end.isoformat(),
+            })
+            window_start = window_end
+        return self.target_partitions(partitions)
+
+    @property
+    def markdown_workers(self) -> int:
+        """Number of processes converting `child_blocks` to markdown."""
+        if self.plan is not None:
+            return self.plan.markdown_workers
+        return self.config.get("markdown_workers") or 0
+
+    @property
+    def unknown_block_policy(self) -> UnknownBlockPolicy:
+        return UnknownBlockPolicy(
+            self.config.get("unknown_block_policy", DEFAULT_UNKNOWN_BLOCK_POLICY)
+        )
+
+    @cached_property
+    def _convert(self) -> Callable[[List[dict]], Tuple[str, float]]:
+        # A partial of a module level function, so that it can be pickled.
+        return functools.partial(_timed_convert, self.unknown_block_policy)
+
+    def estimate_sample(self, rows: int, sample: List[dict], seconds: float) -> tuning.Estimate:
+        estimate = super().estimate_sample(rows, sample, seconds)
+        blocks = [record["child_blocks"] for record in sample if record.get("child_blocks")]
+        if not blocks:
+            return estimate
+        markdown_seconds = sum(seconds for _, seconds in map(self._convert, blocks))
+        return dataclasses.replace(
+            estimate, markdown_seconds_per_row=markdown_seconds / len(sample)
+        )
+
+    def get_last_updated(self, context: Dict) -> datetime:
+        last_updated = super().get_last_updated(context)
+        if context and "updated_from" in context:
+            return max(last_updated, datetime.fromisoformat(context["updated_from"]))
+        return last_updated
+
+    def get_query_parameters(self, context: Dict) -> dict:
+        updated_before = (context or {}).get("updated_before")
+        return {
+            "updated_before": datetime.fromisoformat(updated_before) if updated_before else None,
         }
-        '''
-        results = self.client.query(query, last_updated=last_updated)
-        for result in results:
-            yield {
-                "id": result.id,
-                "space_id": result.space_id,
-                "user_id": result.user_id,
-                "title":result.title, 
-                "deletion": result.deleted,
-                "created": result.created,
-                "updated": result.updated,
-                "child_blocks": convert_blocks_to_markdown(result.child_blocks) if result.node_type == "Text" else "",
-                "node_content": result.node_content,
-                "node_type": result.node_type,
-                "node_url": result.node_url,
-                "categories": result.categories,
+
+    def get_required_properties(self) -> Set[str]:
+        required = super().get_required_properties()
+        if self.mask[("properties", "child_blocks")]:
+            # Tells which nodes have blocks to convert.
+            required.add("node_type")
+        return required
+
+    def parse_result(self, result: edgedb.Object) -> dict:
+        record = super().parse_result(result)
+        if "child_blocks" in record:
+            # Converted to markdown a page at a time by `get_pages`.
+            record["child_blocks"] = [
+                {"block_type": block.block_type, "block_data": _decode_json(block.block_data)}
+                for block in record["child_blocks"]
+            ] if record["node_type"] == "Text" else None
+        return record
+
+    def parse_json_result(self, record: dict) -> dict:
+        if "child_blocks" in record:
+            record["child_blocks"] = [
+                {"block_type": block["block_type"], "block_data": _decode_json(block["block_data"])}
+                for block in record["child_blocks"]
+            ] if record["node_type"] == "Text" else None
+        return record
+
+    def get_pages(self, context: Dict) -> Iterable[List[dict]]:
+        """Yield pages of records with `child_blocks` converted to markdown.
+
+        Markdown found in the tap's markdown cache is reused. When
+        `markdown_workers` is set, the rest of each page is converted by the
+        tap's process pool while the next page is being fetched.
+        """
+        if "child_blocks" not in self.fetched_properties:
+            yield from super().get_pages(context)
+            return
+        executor = self._tap.get_markdown_executor(self.markdown_workers)
+        pending = None
+        for page in super().get_pages(context):
+            misses = self._apply_cached_markdown(page)
+            blocks = [record["child_blocks"] for record, _ in misses]
+            if executor is None:
+                yield self._apply_markdown(page, misses, map(self._convert, blocks))
+                continue
+            # `Executor.map` submits every item straight away.
+            converted = executor.map(
+                self._convert,
+                blocks,
+                chunksize=max(1, len(blocks) // (self.markdown_workers * 4)),
+            )
+            if pending is not None:
+                yield self._apply_markdown(*pending)
+            pending = (page, misses, converted)
+        if pending is not None:
+            yield self._apply_markdown(*pending)
+
+    def _apply_cached_markdown(self, page: List[dict]) -> List[Tuple[dict, Optional[str]]]:
+        """Fill in `child_blocks` from the markdown cache where possible.
+
+        Returns:
+            The records still to be converted, with their cache keys.
+        """
+        cache = self._tap.markdown_cache
+        misses = []
+        for record in page:
+            child_blocks = record["child_blocks"]
+            if child_blocks is None:
+                record["child_blocks"] = ""
+                continue
+            key = None
+            if cache is not None:
+                key = cache.key(child_blocks, self.unknown_block_policy)
+                markdown = cache.get(key)
+                if markdown is not None:
+                    record["child_blocks"] = markdown
+                    continue
+            misses.append((record, key))
+        return misses
+
+    def _apply_markdown(
+        self,
+        page: List[dict],
+        misses: List[Tuple[dict, Optional[str]]],
+        markdown: Iterable[Tuple[str, float]],
+    ) -> List[dict]:
+        cache = self._tap.markdown_cache
+        for (record, key), (child_blocks, seconds) in zip(misses, markdown):
+            self.extraction_metrics.observe(
+                instrumentation.Metric.MARKDOWN_DURATION, seconds
+            )
+            record["child_blocks"] = child_blocks
+            if key is not None:
+                cache.put(key, child_blocks)
+        return page
+
+
+class UserFollowingStream(RelationshipStream):
+    """Users followed by each user, as of the sync of that user.
+
+    `sane_users` replicates on `created`, so a user is only synced once, and
+    the follows and unfollows made after that are only sent by a full resync.
+    """
+
+    name = "sane_user_following"
+    parent_stream_type = UserModelStream
+    primary_keys = ["user_id", "following_id"]
+    parent_property = "following"
+    parent_key = "user_id"
+    related_key = "following_id"
+    schema = th.PropertiesList(
+        th.Property("user_id", th.StringType),
+        th.Property("following_id", th.StringType),
+        th.Property(PARENT_VERSION_KEY, th.DateTimeType),
+        th.Property(SOURCE_KEY, th.StringType),
+    ).to_dict()
+
+
+class SpaceFollowersStream(RelationshipStream):
+    name = "sane_space_followers"
+    parent_stream_type = SpaceModelStream
+    primary_keys = ["space_id", "user_id"]
+    parent_property = "followers"
+    parent_key = "space_id"
+    related_key = "user_id"
+    schema = th.PropertiesList(
+        th.Property("space_id", th.StringType),
+        th.Property("user_id", th.StringType),
+        th.Property(PARENT_VERSION_KEY, th.DateTimeType),
+        th.Property(SOURCE_KEY, th.StringType),
+    ).to_dict()
+
+
+class DeletionStream:
+    """Tombstones of the records of `source_stream_type` deleted since the last run.
+
+    Mixed into a subclass of the source stream, whose `query` selects the
+    deleted objects instead, ordered by `deleted_at`, the time of their
+    deletion. This is cheap to run incrementally, since it only returns the
+    objects deleted after its own bookmark. The records are those of the source
+    stream with `_sdc_deleted_at` set, and are written to the source stream, so
+    targets soft or hard delete the rows they already hold. Deselected by
+    default.
+    """
+
+    replication_key = "_sdc_deleted_at"
+    selected_by_default = False
+    source_stream_type: type
+
+    @property
+    def stream_maps(self) -> List[StreamMap]:
+        # Write tombstones under the name of the source stream, transformed by
+        # the same stream maps as its records.
+        if not self._stream_maps:
+            self._stream_maps = self._tap.mapper.stream_maps[self.source_stream_type.name]
+        return self._stream_maps
+
+    def _generate_schema_messages(self) -> Iterator[SchemaMessage]:
+        # The SCHEMA message goes to the source stream too, so it announces the
+        # source stream's bookmark, not that of the tombstones.
+        replication_key = self.source_stream_type.replication_key
+        for message in super()._generate_schema_messages():
+            message.bookmark_properties = [replication_key] if replication_key else None
+            yield message
+
+    def _write_batch_message(
+        self,
+        encoding: BaseBatchFileEncoding,
+        manifest: List[str],
+    ) -> None:
+        # Like the RECORD messages, batches of tombstones go to the source
+        # stream, the only one targets have a schema for.
+        self._tap.write_message(
+            SDKBatchMessage(
+                stream=self.stream_maps[0].stream_alias,
+                encoding=encoding,
+                manifest=manifest,
+            ),
+        )
+        self._is_state_flushed = False
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        return self.target_partitions(None)
+
+    def get_query_parameters(self, context: Dict) -> dict:
+        return {}
+
+
+class UserDeletionStream(DeletionStream, UserModelStream):
+    name = "sane_users_deletions"
+    source_stream_type = UserModelStream
+
+    query_template = '''
+    with
+        users := (
+            select User {
+                id,
+                username,
+                bio,
+                account_created,
+                account_deletion: {
+                    id,
+                    created
+                },
+                following: {
+                    id
+                },
+                spaces: {
+                    id
+                }
+            }
+            filter (
+                .account_deletion.created > <datetime>$last_updated
+                or (.account_deletion.created = <datetime>$last_updated and .id > <uuid>$last_id)
+            )
+            order by .account_deletion.created then .id
+            limit <int64>$limit
+        )
+    select users {shape}
+    order by users.account_deletion.created then users.id
+    '''
+
+    columns = {
+        **UserModelStream.columns,
+        "_sdc_deleted_at": "deleted_at := users.account_deletion.created",
+    }
+
+
+class SpaceDeletionStream(DeletionStream, SpaceModelStream):
+    name = "sane_spaces_deletions"
+    source_stream_type = SpaceModelStream
+
+    query_template = '''
+    WITH
+        spaces := (
+            select Space {
+                id,
+                title,
+                description,
+                created,
+                updated,
+                is_public,
+                deletion: {
+                    id,
+                    created
+                },
+                owner: {
+                    id
+                },
+                nodes: {
+                    id
+                },
+                followers: {
+                    id
+                },
+                categories,
             }
+            filter (
+                .deletion.created > <datetime>$last_updated
+                or (.deletion.created = <datetime>$last_updated and .id > <uuid>$last_id)
+            )
+            order by .deletion.created then .id
+            limit <int64>$limit
+        )
+    SELECT spaces {shape}
+    order by spaces.deletion.created then spaces.id
+    '''
+
+    columns = {
+        **SpaceModelStream.columns,
+        "_sdc_deleted_at": "deleted_at := spaces.deletion.created",
+    }
+
+
+class SpaceNodeDeletionStream(DeletionStream, SpaceNodeModelStream):
+    """Nodes deleted themselves, or through the deletion of their space."""
+
+    name = "sane_space_nodes_deletions"
+    source_stream_type = SpaceNodeModelStream
+
+    query_template = '''
+    WITH
+        nodes := (
+            select Node {
+                id,
+                title,
+                updated,
+                created,
+                node_content,
+                node_url,
+                node_type,
+                deletion: {
+                    id
+                },
+                creator: {
+                    id
+                },
+                owning_space: {
+                    id,
+                    owner: {
+                        id
+                    }
+                },
+                categories,
+            }
+            # Nodes disappear from `sane_space_nodes` with their space.
+            filter (
+                min({.deletion.created, .owning_space.deletion.created}) > <datetime>$last_updated
+                or (
+                    min({.deletion.created, .owning_space.deletion.created}) = <datetime>$last_updated
+                    and .id > <uuid>$last_id
+                )
+            )
+            order by min({.deletion.created, .owning_space.deletion.created}) then .id
+            limit <int64>$limit
+        )
+    SELECT nodes {shape}
+    order by min({nodes.deletion.created, nodes.owning_space.deletion.created})
+        then nodes.id
+    '''
+
+    columns = {
+        **SpaceNodeModelStream.columns,
+        "_sdc_deleted_at": (
+            "deleted_at := min({nodes.deletion.created, nodes.owning_space.deletion.created})"
+        ),
+    }
@@ -2,10 +2,37 @@
 
 from __future__ import annotations
 
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from typing import TYPE_CHECKING
+
 from singer_sdk import Tap
 from singer_sdk import typing as th  # JSON schema typing helpers
+from singer_sdk._singerlib import Message, StateMessage
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_saneedgedb import (
+    client,
+    concurrency,
+    digest_index,
+    instrumentation,
+    markdown_cache,
+    output,
+    rich_text_serializer,
+    streams,
+    tuning,
+)
 
-from tap_saneedgedb import streams
+if TYPE_CHECKING:
+    import edgedb
+
+# Marks the end of a stream's pages when syncing concurrently.
+_STREAM_END = object()
 
 
 class TapSaneEdgedbTap(Tap):
@@ -38,6 +65,24 @@ class TapSaneEdgedbTap(Tap):
             "edgedb_database",
             th.StringType,
         ),
+        th.Property(
+            "edgedb_targets",
+            th.ArrayType(
+                th.ObjectType(
+                    th.Property("name", th.StringType),
+                    th.Property("database", th.StringType),
+                    th.Property("branch", th.StringType),
+                )
+            ),
+            description=(
+                "Databases or branches of the EdgeDB instance to extract, "
+                "instead of `edgedb_database` and `edgedb_branch`. Each target "
+                "sets either a `database` or a `branch`. Records are "
+                "tagged with the target's `name` in `_sdc_source`, which defaults "
+                "to its branch or database, and each target keeps its own "
+                "bookmarks. Up to `partition_workers` targets are queried at once."
+            ),
+        ),
         th.Property(
             "edgedb_password",
             th.StringType,
@@ -52,8 +97,549 @@ class TapSaneEdgedbTap(Tap):
             "edgedb_client_tls_security",
             th.StringType,
         ),
+        th.Property(
+            "edgedb_max_concurrency",
+            th.IntegerType,
+            description=(
+                "Maximum number of pooled connections shared by all streams. "
+                "Defaults to the concurrency suggested by the server."
+            ),
+        ),
+        th.Property(
+            "edgedb_connect_timeout",
+            th.IntegerType,
+            default=client.DEFAULT_CONNECT_TIMEOUT,
+            description="Seconds to wait for a single connection attempt.",
+        ),
+        th.Property(
+            "edgedb_wait_until_available",
+            th.IntegerType,
+            default=client.DEFAULT_WAIT_UNTIL_AVAILABLE,
+            description=(
+                "Seconds to keep retrying the connection while the server is "
+                "unavailable."
+            ),
+        ),
+        th.Property(
+            "page_size",
+            th.IntegerType,
+            default=streams.DEFAULT_PAGE_SIZE,
+            description=(
+                "Number of records fetched per keyset-paginated query. Lower "
+                "values reduce memory use, higher values reduce round trips."
+            ),
+        ),
+        th.Property(
+            "json_passthrough",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Fetch pages with `query_json`, so that EdgeDB encodes the records "
+                "as JSON and they are decoded in a single call per page, instead "
+                "of converting each result object in Python."
+            ),
+        ),
+        th.Property(
+            "state_checkpoint_records",
+            th.IntegerType,
+            description=(
+                "Write a STATE message every this many records, besides the one "
+                "written after each page, so that an interrupted sync resumes "
+                "closer to where it stopped."
+            ),
+        ),
+        th.Property(
+            "state_checkpoint_seconds",
+            th.NumberType,
+            description=(
+                "Write a STATE message once this many seconds have passed since "
+                "the last one, besides the one written after each page."
+            ),
+        ),
+        th.Property(
+            "space_nodes_partition_days",
+            th.IntegerType,
+            description=(
+                "Split `sane_space_nodes` into partitions covering this many days "
+                "of `updated` time each. Every partition keeps its own bookmark."
+            ),
+        ),
+        th.Property(
+            "partition_workers",
+            th.IntegerType,
+            default=1,
+            description="Number of partitions fetched in parallel.",
+        ),
+        th.Property(
+            "markdown_workers",
+            th.IntegerType,
+            description=(
+                "Number of worker processes converting `child_blocks` to "
+                "markdown while the next page is fetched. Unset or 0 converts "
+                "on the syncing thread."
+            ),
+        ),
+        th.Property(
+            "unknown_block_policy",
+            th.StringType,
+            default=rich_text_serializer.DEFAULT_UNKNOWN_BLOCK_POLICY.value,
+            allowed_values=[
+                policy.value for policy in rich_text_serializer.UnknownBlockPolicy
+            ],
+            description=(
+                "What to do with `child_blocks` that cannot be converted to "
+                "markdown: `skip` them, write a `placeholder` HTML comment, or "
+                "`fail` the sync."
+            ),
+        ),
+        th.Property(
+            "markdown_cache_dir",
+            th.StringType,
+            description=(
+                "Directory of an on-disk cache of markdown keyed by a hash of the "
+                "raw `child_blocks`, reused across runs. Unset disables caching."
+            ),
+        ),
+        th.Property(
+            "markdown_cache_max_mb",
+            th.IntegerType,
+            default=markdown_cache.DEFAULT_MAX_MB,
+            description=(
+                "Size of cached markdown kept after each run. The least recently "
+                "used entries are evicted first."
+            ),
+        ),
+        th.Property(
+            "digest_index_dir",
+            th.StringType,
+            description=(
+                "Directory of an on-disk index of the digest of the last record "
+                "written for each id, reused across runs. Records identical to the "
+                "last ones written, ignoring `updated`, are dropped. Unset writes "
+                "every record."
+            ),
+        ),
+        th.Property(
+            "metrics_summary_path",
+            th.StringType,
+            description=(
+                "File to write a summary of the extraction metrics to at the end "
+                "of the sync, e.g. for a Prometheus textfile collector."
+            ),
+        ),
+        th.Property(
+            "metrics_summary_format",
+            th.StringType,
+            default="json",
+            allowed_values=["json", "prometheus"],
+            description="Format of the metrics summary file.",
+        ),
+        th.Property(
+            "concurrent_streams",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Query all selected streams at the same time. Records are still "
+                "written by a single thread, so STATE messages stay correct."
+            ),
+        ),
+        th.Property(
+            "concurrent_queue_size",
+            th.IntegerType,
+            default=concurrency.DEFAULT_QUEUE_SIZE,
+            description=(
+                "Maximum number of fetched pages buffered while waiting to be "
+                "written, when `concurrent_streams` is enabled."
+            ),
+        ),
+        th.Property(
+            "auto_tune",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Estimate the size of each stream with a preflight count and "
+                "sample query, and pick its page size, partition workers and "
+                "markdown workers from the estimate and the budgets below. "
+                "`page_size`, `partition_workers` and `markdown_workers` are "
+                "then ignored."
+            ),
+        ),
+        th.Property(
+            "memory_budget_mb",
+            th.IntegerType,
+            default=tuning.DEFAULT_MEMORY_BUDGET_MB,
+            description=(
+                "Memory the fetched pages of a stream may use at once, when "
+                "`auto_tune` or `adaptive_page_size` is enabled."
+            ),
+        ),
+        th.Property(
+            "page_latency_budget",
+            th.NumberType,
+            default=tuning.DEFAULT_PAGE_LATENCY_BUDGET,
+            description=(
+                "Seconds a single page query may take, when `auto_tune` or "
+                "`adaptive_page_size` is enabled."
+            ),
+        ),
+        th.Property(
+            "adaptive_page_size",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Shrink pages whose query or decoded rows exceed "
+                "`page_latency_budget` or `memory_budget_mb`, and grow them back "
+                "up to the page size while queries are fast."
+            ),
+        ),
+        th.Property(
+            "query_timeout_retries",
+            th.IntegerType,
+            default=tuning.DEFAULT_QUERY_TIMEOUT_RETRIES,
+            description=(
+                "Number of times a page query that timed out on the server is "
+                "retried, each time for half as many rows. 0 fails the sync on "
+                "the first timeout."
+            ),
+        ),
+        th.Property(
+            "query_retry_backoff",
+            th.NumberType,
+            default=tuning.DEFAULT_QUERY_RETRY_BACKOFF,
+            description=(
+                "Seconds to wait before retrying a query that timed out, doubled "
+                "after every consecutive timeout."
+            ),
+        ),
+        th.Property(
+            "auto_tune_max_workers",
+            th.IntegerType,
+            default=tuning.DEFAULT_MAX_WORKERS,
+            description=(
+                "Maximum number of partition and markdown workers per stream, "
+                "when `auto_tune` is enabled."
+            ),
+        ),
+        th.Property(
+            "fast_output",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Serialize messages with orjson and write them to stdout in large "
+                "buffered chunks. Requires the `fast` extra."
+            ),
+        ),
+        th.Property(
+            "fast_output_buffer_kb",
+            th.IntegerType,
+            default=output.DEFAULT_BUFFER_KB,
+            description=(
+                "Size of the output buffer when `fast_output` is enabled. The "
+                "buffer is also flushed after every STATE message."
+            ),
+        ),
+        th.Property(
+            "skip_nested_conformance",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Only conform the top-level fields of records to the schema. The "
+                "nested values are already typed by the tap's queries."
+            ),
+        ),
     ).to_dict()
 
+    _markdown_executor: ProcessPoolExecutor | None = None
+    _markdown_executor_lock = threading.Lock()
+    _edgedb_client: edgedb.Client | None = None
+    _edgedb_client_lock = threading.Lock()
+    _edgedb_target_clients: dict[str, edgedb.Client] | None = None
+    _edgedb_target_clients_lock = threading.Lock()
+    _markdown_cache: markdown_cache.MarkdownCache | None = None
+    _markdown_cache_lock = threading.Lock()
+
+    @property
+    def edgedb_client(self) -> edgedb.Client:
+        """Return the EdgeDB client shared by all streams of this tap.
+
+        The client is created on first use, so `--discover` and `--about` never
+        open a connection. Concurrent streams first ask for it from their worker
+        threads, which must not each create a client.
+
+        Returns:
+            The shared EdgeDB client.
+        """
+        with self._edgedb_client_lock:
+            if self._edgedb_client is None:
+                self.logger.info(
+                    "Connecting to EdgeDB instance %s", self.config.get("edgedb_host")
+                )
+                self._edgedb_client = client.create_edgedb_client(self.config)
+            return self._edgedb_client
+
+    @cached_property
+    def edgedb_targets(self) -> dict[str, dict]:
+        """Return the client config of each target in `edgedb_targets`, by name.
+
+        Returns:
+            The tap config of each target, or no targets to extract from the
+            database of the tap config.
+
+        Raises:
+            ConfigValidationError: If two targets have the same name, or a
+                target does not set exactly one of a database and a branch.
+        """
+        targets: dict[str, dict] = {}
+        for target in self.config.get("edgedb_targets") or ():
+            name = target.get("name") or target.get("branch") or target.get("database")
+            if target.get("database") and target.get("branch"):
+                msg = f"EdgeDB target {name!r} sets both a `database` and a `branch`."
+                raise ConfigValidationError(msg)
+            if not target.get("database") and not target.get("branch"):
+                msg = f"EdgeDB target {name!r} needs a `database` or a `branch`."
+                raise ConfigValidationError(msg)
+            if name in targets:
+                msg = f"Duplicate EdgeDB target {name!r}, set a distinct `name`."
+                raise ConfigValidationError(msg)
+            targets[name] = {
+                **self.config,
+                "edgedb_database": target.get("database"),
+                "edgedb_branch": target.get("branch"),
+            }
+        return targets
+
+    def get_edgedb_client(self, target: str | None = None) -> edgedb.Client:
+        """Return the EdgeDB client of a target in `edgedb_targets`.
+
+        Targets share the connection settings of the tap config, and each gets
+        its own client on first use.
+
+        Args:
+            target: Name of the target, or `None` for `edgedb_client`.
+
+        Returns:
+            The shared EdgeDB client of the target.
+        """
+        if target is None:
+            return self.edgedb_client
+        with self._edgedb_target_clients_lock:
+            if self._edgedb_target_clients is None:
+                self._edgedb_target_clients = {}
+            if target not in self._edgedb_target_clients:
+                self.logger.info(
+                    "Connecting to EdgeDB target %s of instance %s",
+                    target,
+                    self.config.get("edgedb_host"),
+                )
+                self._edgedb_target_clients[target] = client.create_edgedb_client(
+                    self.edgedb_targets[target]
+                )
+            return self._edgedb_target_clients[target]
+
+    def get_markdown_executor(self, workers: int) -> ProcessPoolExecutor | None:
+        """Return the process pool converting `child_blocks` to markdown.
+
+        The pool is started by the first stream asking for one, with that
+        stream's number of workers, and shared with the streams asking later.
+
+        Args:
+            workers: Number of worker processes wanted by the stream.
+
+        Returns:
+            The shared process pool, or `None` to convert on the syncing thread.
+        """
+        if not workers:
+            return None
+        with self._markdown_executor_lock:
+            if self._markdown_executor is None:
+                # The pool may be started from a worker thread, and forking a
+                # process running several threads copies the locks they hold.
+                method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                self._markdown_executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(method),
+                )
+            return self._markdown_executor
+
+    @property
+    def markdown_cache(self) -> markdown_cache.MarkdownCache | None:
+        """Return the on-disk cache of converted markdown, if configured.
+
+        The cache is first asked for from partition or concurrent stream worker
+        threads, which must share a single SQLite connection.
+
+        Returns:
+            The shared markdown cache, or `None` if caching is disabled.
+        """
+        directory = self.config.get("markdown_cache_dir")
+        if not directory:
+            return None
+        with self._markdown_cache_lock:
+            if self._markdown_cache is None:
+                max_mb = self.config.get(
+                    "markdown_cache_max_mb", markdown_cache.DEFAULT_MAX_MB
+                )
+                self._markdown_cache = markdown_cache.MarkdownCache(
+                    directory, max_bytes=max_mb * 1024 * 1024
+                )
+            return self._markdown_cache
+
+    @cached_property
+    def digest_index(self) -> digest_index.DigestIndex | None:
+        """Return the on-disk index of written record digests, if configured.
+
+        Returns:
+            The shared digest index, or `None` to write every record.
+        """
+        directory = self.config.get("digest_index_dir")
+        if not directory:
+            return None
+        # Any stream's bookmark holds the generation of the digests covered by
+        # the STATE message the run starts from.
+        trusted = max(
+            (
+                bookmark.get(digest_index.GENERATION_KEY, 0)
+                for bookmark in self.state.get("bookmarks", {}).values()
+            ),
+            default=0,
+        )
+        return digest_index.DigestIndex(directory, trusted_generation=trusted)
+
+    @cached_property
+    def message_writer(self) -> output.BufferedMessageWriter | None:
+        """Return the buffered writer used when `fast_output` is enabled.
+
+        Returns:
+            The message writer, or `None` to write through the SDK.
+        """
+        if not self.config.get("fast_output"):
+            return None
+        buffer_kb = self.config.get("fast_output_buffer_kb", output.DEFAULT_BUFFER_KB)
+        return output.BufferedMessageWriter(buffer_bytes=buffer_kb * 1024)
+
+    # The SDK marks `sync_all` final, but `concurrent_streams` replaces its loop
+    # over the streams, and library callers need the shared resources released
+    # as much as the CLI does.
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams, then release the resources shared by the streams."""
+        try:
+            if self.config.get("concurrent_streams") and self.config.get(
+                "batch_config"
+            ):
+                self.logger.warning(
+                    "`concurrent_streams` is ignored when `batch_config` is set."
+                )
+                super().sync_all()
+            elif self.config.get("concurrent_streams"):
+                self._sync_all_concurrently()
+            else:
+                super().sync_all()
+        finally:
+            if self._edgedb_client is not None:
+                self._edgedb_client.close()
+                self._edgedb_client = None
+            for target_client in (self._edgedb_target_clients or {}).values():
+                target_client.close()
+            self._edgedb_target_clients = None
+            if self._markdown_executor is not None:
+                self._markdown_executor.shutdown()
+                self._markdown_executor = None
+            if self._markdown_cache is not None:
+                self._markdown_cache.close(self.logger)
+                self._markdown_cache = None
+            index = self.__dict__.get("digest_index")
+            if index is not None:
+                index.close(self.logger)
+            writer = self.__dict__.get("message_writer")
+            if writer is not None:
+                writer.flush()
+            self._report_metrics()
+
+    def write_message(self, message: Message) -> None:
+        """Write a message to stdout, timing it against the message's stream."""
+        started = time.perf_counter()
+        if self.message_writer is None:
+            super().write_message(message)
+        else:
+            self.message_writer.write(message)
+        stream = self.streams.get(getattr(message, "stream", None))
+        if isinstance(stream, streams.EdgeDbStream):
+            stream.extraction_metrics.observe(
+                instrumentation.Metric.SERIALIZATION_DURATION,
+                time.perf_counter() - started,
+            )
+
+    def _report_metrics(self) -> None:
+        """Log the peak RSS and write the metrics summary file, if configured."""
+        instrumentation.log_peak_rss(self.metrics_logger)
+        path = self.config.get("metrics_summary_path")
+        if not path:
+            return
+        instrumentation.write_summary(
+            path,
+            {
+                stream.name: stream.extraction_metrics
+                for stream in self.streams.values()
+                if isinstance(stream, streams.EdgeDbStream)
+            },
+            self.config.get("metrics_summary_format", "json"),
+        )
+
+    def _sync_all_concurrently(self) -> None:
+        """Sync all streams, querying the selected top-level streams concurrently.
+
+        Every stream's pages are fetched by a worker thread and handed back
+        through a bounded queue. Records, SCHEMA and STATE messages are only
+        ever written from this thread.
+        """
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        self.write_message(StateMessage(value=self.state))
+
+        concurrent: dict[str, streams.EdgeDbStream] = {}
+        for stream in self.streams.values():
+            if stream.parent_stream_type:
+                continue
+            if stream.selected:
+                concurrent[stream.name] = stream
+            elif stream.has_selected_descendents:
+                stream.sync()
+                stream.finalize_state_progress_markers()
+            else:
+                self.logger.info("Skipping deselected stream '%s'.", stream.name)
+
+        buffers = {name: deque() for name in concurrent}
+        syncs = {
+            name: stream.start_prefetched_sync(buffers[name])
+            for name, stream in concurrent.items()
+        }
+        sources = {
+            name: itertools.chain(stream.iter_partition_pages(), [_STREAM_END])
+            for name, stream in concurrent.items()
+        }
+        for name, page in concurrency.interleave(
+            sources,
+            queue_size=self.config.get(
+                "concurrent_queue_size", concurrency.DEFAULT_QUEUE_SIZE
+            ),
+        ):
+            if page is _STREAM_END:
+                for _ in syncs[name]:
+                    pass
+                concurrent[name].finalize_state_progress_markers()
+                continue
+            # `None` pages mark the end of a partition and yield no records.
+            buffers[name].append(page)
+            for _ in page or ():
+                next(syncs[name])
+
+        for stream in self.streams.values():
+            stream.log_sync_costs()
+
     def discover_streams(self) -> list[streams.SaneEdgedbTapStream]:
         """Return a list of discovered streams.
 
@@ -64,14 +650,45 @@ class TapSaneEdgedbTap(Tap):
             "sane_users": streams.UserModelStream,
             "sane_spaces": streams.SpaceModelStream,
             "sane_space_nodes": streams.SpaceNodeModelStream,
+            "sane_user_following": streams.UserFollowingStream,
+            "sane_space_followers": streams.SpaceFollowersStream,
+            "sane_users_deletions": streams.UserDeletionStream,
+            "sane_spaces_deletions": streams.SpaceDeletionStream,
+            "sane_space_nodes_deletions": streams.SpaceNodeDeletionStream,
         }
         if self.config.get("stream_name"):
-            return [stream_by_name[self.config["stream_name"]](self)]
+            name = self.config["stream_name"]
+            if name not in stream_by_name:
+                msg = (
+                    f"Unknown `stream_name` {name!r}, "
+                    f"use one of {', '.join(stream_by_name)}."
+                )
+                raise ConfigValidationError(msg)
+            stream_class = stream_by_name[name]
+            discovered = [stream_class(self)]
+            # Child streams are synced through their parent.
+            if stream_class.parent_stream_type:
+                discovered.append(stream_class.parent_stream_type(self))
+            # Tombstones are written to the stream of the records they delete,
+            # which only provides their schema and stream maps. Deletion streams
+            # are deselected by default, so the named one is selected instead.
+            source_stream_type = getattr(stream_class, "source_stream_type", None)
+            if source_stream_type is not None:
+                source = source_stream_type(self)
+                discovered[0].metadata.root.selected = True
+                source.metadata.root.selected = False
+                discovered.append(source)
+            return discovered
 
         return [
             streams.UserModelStream(self),
             streams.SpaceModelStream(self),
             streams.SpaceNodeModelStream(self),
+            streams.UserFollowingStream(self),
+            streams.SpaceFollowersStream(self),
+            streams.UserDeletionStream(self),
+            streams.SpaceDeletionStream(self),
+            streams.SpaceNodeDeletionStream(self),
         ]
 
 
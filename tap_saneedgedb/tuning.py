@@ -0,0 +1,169 @@
+"""Sync settings derived from a preflight estimate of a stream's size."""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_PAGE_LATENCY_BUDGET = 2.0
+DEFAULT_MAX_WORKERS = 4
+
+# Number of rows fetched by the preflight sample query.
+SAMPLE_ROWS = 50
+
+MIN_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 20000
+# Parallel fetching only pays off once every worker has a few pages to fetch.
+MIN_PAGES_PER_WORKER = 4
+# A process pool only pays off once converting takes longer than starting it.
+MIN_MARKDOWN_SECONDS = 2.0
+
+DEFAULT_QUERY_TIMEOUT_RETRIES = 5
+DEFAULT_QUERY_RETRY_BACKOFF = 1.0
+# Pages are grown back once their query takes less than this fraction of the
+# latency budget, so that a doubled page still fits in it.
+GROW_BELOW_LATENCY = 0.4
+
+
+@dataclass(frozen=True)
+class Estimate:
+    """Size of a stream, from a server-side count and a sample of its rows."""
+
+    rows: int
+    bytes_per_row: float
+    seconds_per_row: float
+    markdown_seconds_per_row: float = 0.0
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Sync settings of a stream."""
+
+    page_size: int
+    partition_workers: int
+    markdown_workers: int
+
+
+def plan(
+    estimate: Estimate,
+    *,
+    memory_budget: int,
+    page_latency_budget: float,
+    max_workers: int,
+    max_partitions: int,
+    buffered_pages: int,
+) -> Plan:
+    """Pick the page size and worker counts fitting the budgets.
+
+    Args:
+        estimate: The estimated size of the stream.
+        memory_budget: Bytes the fetched pages of the stream may use at once.
+        page_latency_budget: Seconds a single page query may take.
+        max_workers: Maximum number of partition and markdown workers.
+        max_partitions: Number of partitions of the stream.
+        buffered_pages: Pages each partition worker may fetch ahead.
+
+    Returns:
+        The sync settings.
+    """
+    # Sized for the latency budget first, so that the number of pages and
+    # hence of useful workers is known.
+    page_size = _clamp(page_latency_budget / max(estimate.seconds_per_row, 1e-9))
+    pages = math.ceil(estimate.rows / page_size)
+    workers = max(1, min(max_workers, max_partitions, pages // MIN_PAGES_PER_WORKER))
+
+    # Every worker holds the page it is fetching plus those it fetched ahead.
+    pages_in_memory = workers * (buffered_pages + 1)
+    memory_page_size = memory_budget / (max(estimate.bytes_per_row, 1.0) * pages_in_memory)
+    # A single query fetches a small run, and the short page ends it.
+    page_size = min(page_size, _clamp(memory_page_size), estimate.rows + 1)
+
+    markdown_seconds = estimate.rows * estimate.markdown_seconds_per_row
+    markdown_workers = 0
+    if markdown_seconds >= MIN_MARKDOWN_SECONDS:
+        # Enough processes to convert each page while the next is fetched.
+        needed = math.ceil(
+            estimate.markdown_seconds_per_row / max(estimate.seconds_per_row, 1e-9)
+        )
+        markdown_workers = max(1, min(needed, max_workers, (os.cpu_count() or 2) - 1))
+
+    return Plan(
+        page_size=max(1, page_size),
+        partition_workers=workers,
+        markdown_workers=markdown_workers,
+    )
+
+
+class AdaptivePageSize:
+    """Page size of a stream, adjusted to how long its queries take.
+
+    Pages are halved when a query times out, shrunk to fit the budgets when
+    they exceed them, and grown back up to `max_size` while queries are fast.
+
+    Args:
+        page_size: The initial and maximum page size.
+        latency_budget: Seconds a single page query may take.
+        memory_budget: Bytes a single page may use, or `None` for no limit.
+        adapt: Whether to adjust the size to the budgets, rather than only
+            halving it after a timeout.
+    """
+
+    def __init__(
+        self,
+        page_size: int,
+        *,
+        latency_budget: float,
+        memory_budget: float | None = None,
+        adapt: bool = True,
+    ) -> None:
+        self.size = self.max_size = page_size
+        self.latency_budget = latency_budget
+        self.memory_budget = memory_budget
+        self.adapt = adapt
+
+    def split(self) -> bool:
+        """Halve the page size after a timeout.
+
+        Returns:
+            Whether the page size could be reduced.
+        """
+        if self.size <= 1:
+            return False
+        self.size //= 2
+        return True
+
+    def observe(self, rows: int, seconds: float, size: float) -> str | None:
+        """Adjust the page size after a query returning `rows` rows.
+
+        Args:
+            rows: Number of rows the query returned.
+            seconds: Time the query took.
+            size: Decoded size of the rows in bytes.
+
+        Returns:
+            Why the page size changed, or `None` if it did not.
+        """
+        # Only full pages tell how long a page of this size takes.
+        if not self.adapt or rows < self.size:
+            return None
+        if self.memory_budget and size > self.memory_budget:
+            self.size = max(1, int(self.size * self.memory_budget / size))
+            return "page over the memory budget"
+        if seconds > self.latency_budget:
+            self.size = max(1, int(self.size * self.latency_budget / seconds))
+            return "query over the latency budget"
+        grown = min(self.max_size, self.size * 2)
+        if (
+            grown > self.size
+            and seconds < self.latency_budget * GROW_BELOW_LATENCY
+            and not (self.memory_budget and size * 2 > self.memory_budget)
+        ):
+            self.size = grown
+            return "fast query"
+        return None
+
+
+def _clamp(page_size: float) -> int:
+    return int(min(max(page_size, MIN_PAGE_SIZE), MAX_PAGE_SIZE))
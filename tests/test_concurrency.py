@@ -0,0 +1,23 @@
+import pytest
+
+from tap_saneedgedb.concurrency import interleave
+
+
+def test_interleave_keeps_order_per_source():
+    sources = {
+        "a": iter(range(50)),
+        "b": iter(range(100, 130)),
+    }
+    items = list(interleave(sources, queue_size=2))
+
+    assert [item for name, item in items if name == "a"] == list(range(50))
+    assert [item for name, item in items if name == "b"] == list(range(100, 130))
+
+
+def test_interleave_reraises_source_errors():
+    def failing():
+        yield 1
+        raise RuntimeError("query failed")
+
+    with pytest.raises(RuntimeError, match="query failed"):
+        list(interleave({"a": failing(), "b": iter(range(1000))}, queue_size=1))
@@ -0,0 +1,41 @@
+import logging
+
+from tap_saneedgedb.digest_index import DigestIndex
+
+
+def test_unchanged_records_are_suppressed_across_runs(tmp_path):
+    index = DigestIndex(str(tmp_path))
+    digest = index.digest([{"id": "a", "title": "hello"}])
+    assert index.generation == 1
+    assert not index.unchanged("sane_spaces", "a", digest)
+    assert not index.unchanged("sane_spaces", "a", digest)
+    index.commit()
+    index.close(logging.getLogger(__name__))
+
+    index = DigestIndex(str(tmp_path), trusted_generation=1)
+    assert index.generation == 2
+    assert index.unchanged("sane_spaces", "a", digest)
+    assert not index.unchanged("sane_users", "a", digest)
+    changed = index.digest([{"id": "a", "title": "world"}])
+    assert not index.unchanged("sane_spaces", "a", changed)
+    assert index.suppressed == {"sane_spaces": 1}
+
+
+def test_only_committed_and_trusted_digests_are_relied_upon(tmp_path):
+    index = DigestIndex(str(tmp_path))
+    committed = index.digest([{"id": "a"}])
+    pending = index.digest([{"id": "b"}])
+    index.unchanged("sane_spaces", "a", committed)
+    index.commit()
+    index.unchanged("sane_spaces", "b", pending)
+    index.close(logging.getLogger(__name__))
+
+    index = DigestIndex(str(tmp_path), trusted_generation=1)
+    assert index.unchanged("sane_spaces", "a", committed)
+    assert not index.unchanged("sane_spaces", "b", pending)
+    index.close(logging.getLogger(__name__))
+
+    # The state of the run that committed the digest was never saved.
+    index = DigestIndex(str(tmp_path), trusted_generation=0)
+    assert not index.unchanged("sane_spaces", "a", committed)
+    assert index.generation == 2
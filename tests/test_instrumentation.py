@@ -0,0 +1,18 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+from tap_saneedgedb.instrumentation import decoded_size
+
+
+def test_decoded_size_counts_nested_values():
+    follower = uuid.uuid4()
+    record = {
+        "id": str(uuid.uuid4()),
+        "updated": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "followers": [follower] * 100,
+        "child_blocks": [{"block_type": "text", "block_data": {"text": "x" * 500}}],
+    }
+    size = decoded_size([record])
+    assert size > 100 * len(str(follower)) + 500
+    assert size == len(json.dumps([record], separators=(",", ":"), default=str))
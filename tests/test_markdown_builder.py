@@ -0,0 +1,26 @@
+import io
+
+import pytest
+
+from tap_saneedgedb.markdown_builder import MarkdownBuilder
+
+
+@pytest.mark.parametrize(
+    "builder",
+    [
+        MarkdownBuilder(),
+        MarkdownBuilder().linebreak(),
+        MarkdownBuilder().text("  only  "),
+        MarkdownBuilder().linebreak().h3("Title").paragraph("Body").image("a.png").linebreak(),
+        MarkdownBuilder().text(" ").unordered_list("one").ordered_list("two").text("\n"),
+    ],
+)
+def test_write_to_matches_build(builder):
+    fp = io.StringIO()
+    builder.write_to(fp)
+    assert fp.getvalue() == builder.build()
+
+
+def test_build_joins_fragments():
+    builder = MarkdownBuilder().h3("Title").text("see ").inline_link("docs", "https://x.y")
+    assert builder.build() == "### Title\n\nsee [docs](https://x.y)"
@@ -0,0 +1,28 @@
+import logging
+
+from tap_saneedgedb.markdown_cache import MarkdownCache
+
+
+def test_cache_round_trip_across_runs(tmp_path):
+    blocks = [{"block_type": "text", "block_data": {"text": "hello"}}]
+    cache = MarkdownCache(str(tmp_path), max_bytes=1024)
+    key = cache.key(blocks)
+    assert cache.get(key) is None
+    cache.put(key, "hello")
+    cache.close(logging.getLogger(__name__))
+
+    cache = MarkdownCache(str(tmp_path), max_bytes=1024)
+    assert cache.get(key) == "hello"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = MarkdownCache(str(tmp_path), max_bytes=10)
+    for key in ("a", "b", "c"):
+        cache.put(key, "12345")
+    cache.get("a")
+
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.get("c") == "12345"
@@ -0,0 +1,56 @@
+import copy
+
+import pytest
+
+from tap_saneedgedb.rich_text_serializer import (
+    UnknownBlockError,
+    convert_blocks_to_markdown,
+    iter_markdown,
+)
+
+BLOCKS = [
+    {"block_type": "rich_text", "block_data": {"isHeading": True, "content": "Title"}},
+    {"block_type": "rich_text", "block_data": {}},
+    {
+        "block_type": "rich_text",
+        "block_data": [
+            {"type": "text", "text": "see "},
+            {"imageSrc": "https://x.y/a.png", "type": "text"},
+            {"type": "link", "href": "https://x.y", "content": [{"text": "docs"}]},
+        ],
+    },
+    {"block_type": "rich_text", "block_data": {"text": "Body"}},
+]
+
+
+def test_converts_without_modifying_the_blocks():
+    blocks = copy.deepcopy(BLOCKS)
+    markdown = convert_blocks_to_markdown(blocks)
+
+    assert blocks == BLOCKS
+    assert markdown == "### Title\n\nsee ![](https://x.y/a.png)\n\n[docs](https://x.y)Body"
+
+
+def test_yields_fragments():
+    assert list(iter_markdown(BLOCKS[:1])) == ["### Title\n\n"]
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("skip", "before\nafter"),
+        ("placeholder", "before\n<!-- unsupported block: video -->\nafter"),
+    ],
+)
+def test_unknown_blocks_follow_the_policy(policy, expected):
+    blocks = [
+        {"block_data": {"text": "before"}},
+        {"block_data": [{"type": "video", "src": "v.mp4"}]},
+        {"block_data": {"text": "after"}},
+    ]
+    assert convert_blocks_to_markdown(blocks, policy) == expected
+
+
+def test_malformed_blocks_fail_with_the_fail_policy():
+    with pytest.raises(UnknownBlockError):
+        convert_blocks_to_markdown([{"block_data": {"title": "no text"}}], "fail")
@@ -0,0 +1,530 @@
+"""Offline stream tests against the benchmark suite's fake EdgeDB client."""
+
+import contextlib
+import gzip
+import io
+import json
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import edgedb
+import pytest
+from singer_sdk._singerlib import RecordMessage
+from singer_sdk.exceptions import ConfigValidationError
+
+from benchmarks import fake_edgedb, synthetic
+from tap_saneedgedb import markdown_cache
+from tap_saneedgedb.client import create_edgedb_client
+from tap_saneedgedb.tap import TapSaneEdgedbTap
+
+DATASET = synthetic.generate(users=20, spaces=30, nodes=120, max_blocks=5, seed=1)
+
+
+def run(dataset=DATASET, catalog=None, state=None, timeout_above=None, **config):
+    with mock.patch(
+        "edgedb.create_client",
+        fake_edgedb.create_client(dataset, timeout_above=timeout_above),
+    ):
+        tap = TapSaneEdgedbTap(
+            config={"page_size": 7, **config}, catalog=catalog, state=state
+        )
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            tap.sync_all()
+    return tap, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def sync(dataset=DATASET, catalog=None, **config):
+    return run(dataset, catalog, **config)[1]
+
+
+def record_ids(messages, stream):
+    return [
+        message["record"]["id"]
+        for message in messages
+        if message["type"] == "RECORD" and message["stream"] == stream
+    ]
+
+
+def test_discovery_does_not_load_the_optional_modules():
+    script = (
+        "import sys; from tap_saneedgedb.tap import TapSaneEdgedbTap; "
+        "TapSaneEdgedbTap(config={}).catalog_dict; "
+        "print([name for name in ('edgedb', 'orjson', 'sqlite3') if name in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.splitlines()[-1] == "[]"
+
+
+def test_keyset_pagination_returns_every_row_once_in_order():
+    messages = sync()
+    for stream, rows in (
+        ("sane_users", DATASET.users),
+        ("sane_spaces", DATASET.spaces),
+        ("sane_space_nodes", DATASET.nodes),
+    ):
+        assert record_ids(messages, stream) == [str(row.id) for row in rows]
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"concurrent_streams": True},
+        {"space_nodes_partition_days": 60, "partition_workers": 3},
+        {
+            "concurrent_streams": True,
+            "space_nodes_partition_days": 60,
+            "partition_workers": 3,
+        },
+        {"concurrent_streams": True, "partition_workers": 2, "markdown_workers": 2},
+    ],
+)
+def test_parallel_modes_match_sequential_sync(config):
+    expected = sync()
+    messages = sync(**config)
+    for stream in ("sane_users", "sane_spaces", "sane_space_nodes"):
+        assert record_ids(messages, stream) == record_ids(expected, stream)
+
+
+def test_concurrent_streams_share_one_client():
+    created = []
+    create_client = fake_edgedb.create_client(DATASET)
+
+    def slow_create_client(**kwargs):
+        time.sleep(0.05)
+        created.append(create_client(**kwargs))
+        return created[-1]
+
+    with mock.patch("edgedb.create_client", slow_create_client):
+        tap = TapSaneEdgedbTap(config={"page_size": 7, "concurrent_streams": True})
+        with contextlib.redirect_stdout(io.StringIO()):
+            tap.sync_all()
+    assert len(created) == 1
+
+
+def test_partition_workers_share_one_markdown_cache(tmp_path):
+    created = []
+
+    class SlowMarkdownCache(markdown_cache.MarkdownCache):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    config = {
+        "markdown_cache_dir": str(tmp_path),
+        "space_nodes_partition_days": 60,
+        "partition_workers": 3,
+    }
+    with mock.patch.object(markdown_cache, "MarkdownCache", SlowMarkdownCache):
+        expected = sync(stream_name="sane_space_nodes", **config)
+        assert len(created) == 1
+        messages = sync(stream_name="sane_space_nodes", **config)
+    assert created[0].misses > 0
+    assert (created[1].hits, created[1].misses) == (created[0].misses, 0)
+    assert [m["record"] for m in messages if m["type"] == "RECORD"] == [
+        m["record"] for m in expected if m["type"] == "RECORD"
+    ]
+
+
+def test_partitions_keep_their_own_bookmarks():
+    messages = sync(space_nodes_partition_days=60)
+    state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+    partitions = state["bookmarks"]["sane_space_nodes"]["partitions"]
+    assert len(partitions) > 1
+    for partition in partitions:
+        if "replication_key_value" in partition:
+            assert (
+                partition["context"]["updated_from"]
+                <= partition["replication_key_value"]
+                < partition["context"]["updated_before"]
+            )
+
+
+def test_timed_out_queries_are_retried_with_smaller_pages():
+    expected = sync()
+    messages = sync(timeout_above=2, query_retry_backoff=0)
+    for stream in ("sane_users", "sane_spaces", "sane_space_nodes"):
+        assert record_ids(messages, stream) == record_ids(expected, stream)
+
+    with pytest.raises(edgedb.QueryTimeoutError):
+        sync(timeout_above=2, query_retry_backoff=0, query_timeout_retries=1)
+
+
+def test_checkpoints_resume_right_after_the_last_written_record():
+    # Users created within a few minutes of each other share timestamps, so
+    # resuming relies on the id tie-breaker.
+    dataset = synthetic.generate(
+        users=60, spaces=5, nodes=5, span=timedelta(minutes=3), seed=2
+    )
+    messages = sync(dataset, stream_name="sane_users", state_checkpoint_records=3)
+    expected = record_ids(messages, "sane_users")
+
+    written = 0
+    checkpoints = []
+    for message in messages:
+        if message["type"] == "RECORD" and message["stream"] == "sane_users":
+            written += 1
+        elif message["type"] == "STATE" and written:
+            checkpoints.append((written, message["value"]))
+    assert [written for written, _ in checkpoints[:4]] == [3, 6, 7, 10]
+
+    for written, state in checkpoints[:-1]:
+        resumed = sync(dataset, state=state, stream_name="sane_users")
+        assert record_ids(resumed, "sane_users") == expected[written:]
+
+
+@pytest.mark.parametrize(
+    "config",
+    [{}, {"partition_workers": 2, "space_nodes_partition_days": 60}, {"concurrent_streams": True}],
+)
+def test_targets_are_extracted_with_their_own_bookmarks(config):
+    datasets = {
+        "tenant_a": DATASET,
+        "main": synthetic.generate(users=10, spaces=15, nodes=40, max_blocks=5, seed=2),
+    }
+    messages = sync(
+        datasets,
+        edgedb_targets=[{"database": "tenant_a"}, {"name": "b", "branch": "main"}],
+        **config,
+    )
+
+    for source, dataset in (("tenant_a", datasets["tenant_a"]), ("b", datasets["main"])):
+        for stream, rows in (
+            ("sane_users", dataset.users),
+            ("sane_spaces", dataset.spaces),
+            ("sane_space_nodes", dataset.nodes),
+        ):
+            tagged = [
+                m["record"]["id"]
+                for m in messages
+                if m["type"] == "RECORD"
+                and m["stream"] == stream
+                and m["record"]["_sdc_source"] == source
+            ]
+            assert tagged == [str(row.id) for row in rows]
+        followers = {
+            (m["record"]["space_id"], m["record"]["user_id"])
+            for m in messages
+            if m["type"] == "RECORD"
+            and m["stream"] == "sane_space_followers"
+            and m["record"]["_sdc_source"] == source
+            and m["record"]["user_id"]
+        }
+        assert followers == {
+            (str(space.id), str(follower))
+            for space in dataset.spaces
+            for follower in space.followers_list
+        }
+
+    bookmarks = [m for m in messages if m["type"] == "STATE"][-1]["value"]["bookmarks"]
+    users = bookmarks["sane_users"]["partitions"]
+    assert {p["context"]["_sdc_source"]: p["replication_key_value"] for p in users} == {
+        source: max(row.created for row in dataset.users).isoformat()
+        for source, dataset in (("tenant_a", datasets["tenant_a"]), ("b", datasets["main"]))
+    }
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"edgedb_database": "tenant_a", "edgedb_branch": "main"},
+        {"edgedb_targets": [{"database": "tenant_a", "branch": "main"}]},
+        {"edgedb_targets": [{"database": "tenant_a"}, {"name": "b"}]},
+        {"edgedb_targets": [{}]},
+    ],
+)
+def test_targets_without_exactly_one_database_or_branch_are_rejected(config):
+    with pytest.raises(ConfigValidationError, match="branch"):
+        sync(**config)
+
+
+@pytest.mark.parametrize(
+    ("config", "selected"),
+    [
+        ({}, {"database": None}),
+        ({"edgedb_database": "tenant_a"}, {"database": "tenant_a"}),
+        ({"edgedb_branch": "main"}, {"branch": "main"}),
+    ],
+)
+def test_the_client_gets_only_the_database_or_the_branch(config, selected):
+    with mock.patch("edgedb.create_client") as create_client:
+        create_edgedb_client(config)
+    kwargs = create_client.call_args.kwargs
+    assert {k: v for k, v in kwargs.items() if k in ("database", "branch")} == selected
+
+
+def edges(messages, stream):
+    return [m["record"] for m in messages if m["type"] == "RECORD" and m["stream"] == stream]
+
+
+def test_relationship_streams_emit_an_edge_per_related_id():
+    messages = sync()
+    expected = {
+        ("sane_user_following", str(user.user_id), str(followed), user.created)
+        for user in DATASET.users
+        for followed in [*user.following_list, ""]
+    } | {
+        ("sane_space_followers", str(space.id), str(follower), space.updated)
+        for space in DATASET.spaces
+        for follower in [*space.followers_list, ""]
+    }
+    assert {
+        (stream, *(record[key] for key in keys), record["_sdc_parent_version"])
+        for stream, keys in (
+            ("sane_user_following", ("user_id", "following_id")),
+            ("sane_space_followers", ("space_id", "user_id")),
+        )
+        for record in edges(messages, stream)
+    } == {
+        (stream, parent, related, version.isoformat())
+        for stream, parent, related, version in expected
+    }
+
+
+def test_resynced_parents_write_a_marker_newer_than_their_removed_edges():
+    messages = sync(stream_name="sane_space_followers")
+    state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+    space = next(space for space in DATASET.spaces if space.followers_list)
+    resynced = SimpleNamespace(
+        **{
+            **vars(space),
+            "updated": DATASET.spaces[-1].updated + timedelta(minutes=1),
+            "followers_list": [],
+        }
+    )
+    spaces = [*(row for row in DATASET.spaces if row is not space), resynced]
+    dataset = synthetic.Dataset(DATASET.users, spaces, DATASET.nodes)
+    messages = sync(dataset, state=state, stream_name="sane_space_followers")
+
+    # The target deletes the edges of the space older than its latest marker.
+    assert edges(messages, "sane_space_followers") == [
+        {
+            "space_id": str(space.id),
+            "user_id": "",
+            "_sdc_parent_version": resynced.updated.isoformat(),
+        }
+    ]
+
+
+def test_deselected_properties_are_not_fetched():
+    deselected = {"sane_users": {"bio", "following"}, "sane_space_nodes": {"node_content"}}
+    catalog = TapSaneEdgedbTap(config={}).catalog_dict
+    for entry in catalog["streams"]:
+        for metadata in entry["metadata"]:
+            breadcrumb = metadata["breadcrumb"]
+            if breadcrumb and breadcrumb[-1] in deselected.get(entry["tap_stream_id"], ()):
+                metadata["metadata"]["selected"] = False
+    tap, messages = run(catalog=catalog)
+
+    def records(messages, stream):
+        return [m["record"] for m in messages if m["type"] == "RECORD" and m["stream"] == stream]
+
+    assert "bio :=" not in tap.streams["sane_users"].query
+    assert "node_content :=" not in tap.streams["sane_space_nodes"].query
+    for stream, properties in deselected.items():
+        assert records(messages, stream)
+        assert not any(properties & record.keys() for record in records(messages, stream))
+    # Still fetched for the `sane_user_following` stream.
+    assert "following_list :=" in tap.streams["sane_users"].query
+    assert records(messages, "sane_user_following") == records(sync(), "sane_user_following")
+
+
+@pytest.mark.parametrize(
+    "config",
+    [{"fast_output": True, "skip_nested_conformance": True}, {"json_passthrough": True}],
+)
+def test_output_modes_write_the_same_messages(config):
+    def comparable(messages):
+        # Extraction times and signposts depend on when the sync ran.
+        for message in messages:
+            message.pop("time_extracted", None)
+        return [m for m in messages if m["type"] != "STATE"] + [messages[-1]]
+
+    expected = comparable(sync())
+    assert comparable(sync(**config)) == expected
+
+
+def test_batches_hold_the_records_otherwise_written_to_stdout(tmp_path):
+    expected = sync()
+    messages = sync(
+        batch_config={
+            "encoding": {"format": "jsonl", "compression": "gzip"},
+            "storage": {"root": f"file://{tmp_path}"},
+            "batch_size": 50,
+        }
+    )
+    for stream in ("sane_users", "sane_spaces", "sane_space_nodes"):
+        batches = [m for m in messages if m["type"] == "BATCH" and m["stream"] == stream]
+        assert batches
+        records = []
+        for batch in batches:
+            for url in batch["manifest"]:
+                with gzip.open(url.replace("file://", ""), "rt") as fp:
+                    records.extend(json.loads(line) for line in fp)
+        assert records == [
+            m["record"]
+            for m in expected
+            if m["type"] == "RECORD" and m["stream"] == stream
+        ]
+    assert messages[-1]["value"] == expected[-1]["value"]
+
+
+@pytest.mark.parametrize("config", [{}, {"json_passthrough": True}, {"batch_config": None}])
+def test_deletions_are_written_as_tombstones_with_their_own_bookmarks(config, tmp_path):
+    dataset = synthetic.generate(
+        users=20, spaces=30, nodes=120, max_blocks=5, deleted=0.2, seed=1
+    )
+    catalog = TapSaneEdgedbTap(config={}).catalog_dict
+    for entry in catalog["streams"]:
+        for metadata in entry["metadata"]:
+            if metadata["breadcrumb"] == []:
+                metadata["metadata"]["selected"] = True
+    if "batch_config" in config:
+        config = {
+            "batch_config": {
+                "encoding": {"format": "jsonl", "compression": "gzip"},
+                "storage": {"root": f"file://{tmp_path}"},
+            }
+        }
+    messages = sync(dataset, catalog=catalog, **config)
+
+    schemas = {m["stream"] for m in messages if m["type"] == "SCHEMA"}
+    assert {m["stream"] for m in messages if m["type"] == "BATCH"} <= schemas
+    for stream, rows, replication_key in (
+        ("sane_users", dataset.users, "created"),
+        ("sane_spaces", dataset.spaces, "updated"),
+        ("sane_space_nodes", dataset.nodes, "updated"),
+    ):
+        # Tombstones announce the source stream's bookmark in its schema.
+        assert {
+            tuple(m["bookmark_properties"])
+            for m in messages
+            if m["type"] == "SCHEMA" and m["stream"] == stream
+        } == {(replication_key,)}
+        records = []
+        for message in messages:
+            if message["type"] == "RECORD" and message["stream"] == stream:
+                records.append(message["record"])
+            elif message["type"] == "BATCH" and message["stream"] == stream:
+                for url in message["manifest"]:
+                    with gzip.open(url.replace("file://", ""), "rt") as fp:
+                        records.extend(json.loads(line) for line in fp)
+        live = [r["id"] for r in records if "_sdc_deleted_at" not in r]
+        tombstones = [r["id"] for r in records if "_sdc_deleted_at" in r]
+        deleted = [row for row in rows if row.deleted_at is not None]
+        assert live == [str(row.id) for row in rows if row.deleted_at is None]
+        assert tombstones == [
+            str(row.id) for row in sorted(deleted, key=lambda row: (row.deleted_at, row.id))
+        ]
+
+    bookmarks = [m for m in messages if m["type"] == "STATE"][-1]["value"]["bookmarks"]
+    assert bookmarks["sane_space_nodes_deletions"]["replication_key"] == "_sdc_deleted_at"
+    assert bookmarks["sane_space_nodes_deletions"]["replication_key_value"] == max(
+        row.deleted_at for row in dataset.nodes if row.deleted_at
+    ).isoformat()
+
+
+@pytest.mark.parametrize(
+    ("stream_name", "stream", "rows"),
+    [
+        ("sane_users_deletions", "sane_users", "users"),
+        ("sane_spaces_deletions", "sane_spaces", "spaces"),
+        ("sane_space_nodes_deletions", "sane_space_nodes", "nodes"),
+    ],
+)
+def test_stream_name_of_a_deletion_stream_syncs_only_its_tombstones(
+    stream_name, stream, rows
+):
+    dataset = synthetic.generate(
+        users=20, spaces=30, nodes=120, max_blocks=5, deleted=0.2, seed=1
+    )
+    messages = sync(dataset, stream_name=stream_name)
+    records = [m["record"] for m in messages if m["type"] == "RECORD"]
+    deleted = [row for row in getattr(dataset, rows) if row.deleted_at is not None]
+    assert deleted
+    assert {m["stream"] for m in messages if m["type"] == "RECORD"} == {stream}
+    assert [r["id"] for r in records if "_sdc_deleted_at" in r] == [
+        str(row.id) for row in sorted(deleted, key=lambda row: (row.deleted_at, row.id))
+    ]
+    assert all("_sdc_deleted_at" in record for record in records)
+
+
+def test_unknown_stream_name_is_rejected():
+    with pytest.raises(ConfigValidationError, match="sane_users_deletions"):
+        sync(stream_name="sane_user")
+
+
+def test_digest_index_drops_records_identical_to_those_last_written(tmp_path):
+    config = {"stream_name": "sane_spaces", "digest_index_dir": str(tmp_path)}
+    messages = sync(**config)
+    assert record_ids(messages, "sane_spaces") == [str(row.id) for row in DATASET.spaces]
+    state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+
+    # Touch three spaces, one of them also renamed.
+    latest = max(row.updated for row in DATASET.spaces)
+    touched = [
+        SimpleNamespace(**{**vars(row), "updated": latest + timedelta(minutes=position)})
+        for position, row in enumerate(DATASET.spaces[:3], 1)
+    ]
+    touched[0].title = "renamed"
+    dataset = synthetic.Dataset(DATASET.users, DATASET.spaces[3:] + touched, DATASET.nodes)
+    tap, messages = run(dataset, state=state, **config)
+    assert record_ids(messages, "sane_spaces") == [str(touched[0].id)]
+    assert tap.streams["sane_spaces"].extraction_metrics.suppressed_records == 2
+    bookmark = [m for m in messages if m["type"] == "STATE"][-1]["value"]["bookmarks"]
+    assert bookmark["sane_spaces"]["replication_key_value"] == touched[-1].updated.isoformat()
+
+    # Digests written by a run whose state was never saved are not relied upon.
+    messages = sync(dataset, state=state, **config)
+    assert record_ids(messages, "sane_spaces") == [str(touched[0].id)]
+
+
+def test_digest_index_never_suppresses_records_no_state_covered(tmp_path):
+    config = {"page_size": 7, "stream_name": "sane_spaces", "digest_index_dir": str(tmp_path)}
+    expected = [str(row.id) for row in DATASET.spaces]
+    write_message = TapSaneEdgedbTap.write_message
+    written = 0
+
+    def break_pipe_on_the_11th_record(tap, message):
+        nonlocal written
+        if isinstance(message, RecordMessage) and message.stream == "sane_spaces":
+            written += 1
+            if written == 11:
+                raise BrokenPipeError
+        write_message(tap, message)
+
+    stdout = io.StringIO()
+    with mock.patch(
+        "edgedb.create_client", fake_edgedb.create_client(DATASET)
+    ), mock.patch.object(TapSaneEdgedbTap, "write_message", break_pipe_on_the_11th_record):
+        tap = TapSaneEdgedbTap(config=config)
+        with contextlib.redirect_stdout(stdout), pytest.raises(BrokenPipeError):
+            tap.sync_all()
+    messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert record_ids(messages, "sane_spaces") == expected[:10]
+
+    # The last STATE covers the first page, so the run resumes after it.
+    state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+    assert record_ids(sync(state=state, **config), "sane_spaces") == expected[7:]
+
+
+def test_auto_tune_sizes_small_runs_to_a_single_page():
+    expected = sync()
+    tap, messages = run(auto_tune=True, space_nodes_partition_days=60)
+    for stream, rows in (
+        ("sane_users", DATASET.users),
+        ("sane_spaces", DATASET.spaces),
+        ("sane_space_nodes", DATASET.nodes),
+    ):
+        assert record_ids(messages, stream) == record_ids(expected, stream)
+        plan = tap.streams[stream].plan
+        assert plan.page_size == len(rows) + 1
+        assert plan.partition_workers == 1
+        assert plan.markdown_workers == 0
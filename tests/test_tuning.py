@@ -0,0 +1,63 @@
+from tap_saneedgedb.tuning import AdaptivePageSize, Estimate, plan
+
+BUDGETS = {
+    "memory_budget": 64 * 1024 * 1024,
+    "page_latency_budget": 1.0,
+    "max_workers": 4,
+    "max_partitions": 10,
+    "buffered_pages": 8,
+}
+
+
+def test_large_streams_are_split_across_workers_within_the_memory_budget():
+    estimate = Estimate(rows=10_000_000, bytes_per_row=20_000, seconds_per_row=0.0001)
+    result = plan(estimate, **BUDGETS)
+
+    assert result.partition_workers == 4
+    pages_in_memory = result.partition_workers * (BUDGETS["buffered_pages"] + 1)
+    assert result.page_size * estimate.bytes_per_row * pages_in_memory <= BUDGETS["memory_budget"]
+
+
+def test_page_queries_stay_within_the_latency_budget():
+    estimate = Estimate(rows=1_000_000, bytes_per_row=100, seconds_per_row=0.001)
+    result = plan(estimate, **BUDGETS)
+
+    assert result.page_size * estimate.seconds_per_row <= BUDGETS["page_latency_budget"]
+
+
+def test_markdown_workers_keep_up_with_slow_conversion():
+    estimate = Estimate(
+        rows=100_000,
+        bytes_per_row=1000,
+        seconds_per_row=0.0001,
+        markdown_seconds_per_row=0.0002,
+    )
+    assert plan(estimate, **BUDGETS).markdown_workers >= 1
+
+    small = Estimate(
+        rows=10,
+        bytes_per_row=1000,
+        seconds_per_row=0.0001,
+        markdown_seconds_per_row=0.0002,
+    )
+    assert plan(small, **BUDGETS).markdown_workers == 0
+
+
+def test_adaptive_page_size_splits_shrinks_and_grows_back():
+    sizer = AdaptivePageSize(1000, latency_budget=2.0, memory_budget=1_000_000)
+    assert sizer.split() and sizer.size == 500
+    # Short pages end the stream and say nothing about the page size.
+    assert sizer.observe(10, 30.0, 0) is None
+    assert sizer.observe(500, 4.0, 0) is not None and sizer.size == 250
+    assert sizer.observe(250, 0.1, 2_000_000) is not None and sizer.size == 125
+    assert sizer.observe(125, 0.1, 1000) is not None and sizer.size == 250
+    for _ in range(5):
+        sizer.observe(sizer.size, 0.1, 1000)
+    assert sizer.size == 1000
+
+
+def test_adaptive_page_size_only_splits_unless_adapting():
+    sizer = AdaptivePageSize(2, latency_budget=2.0, adapt=False)
+    assert sizer.observe(2, 30.0, 0) is None and sizer.size == 2
+    assert sizer.split() and sizer.size == 1
+    assert not sizer.split()